@@ -0,0 +1,311 @@
+"""
+Part D: Adaptive Consistency Controller
+Chooses write concern, read concern, read preference and maxStalenessSeconds
+per operation from live replication lag and recent latencies, within a
+latency SLO per operation class and a staleness budget for reads
+"""
+
+from pymongo import MongoClient, WriteConcern, ReadPreference
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import SecondaryPreferred
+from collections import deque, namedtuple, Counter
+import itertools
+import os
+import random
+import threading
+import time
+import traceback
+
+from cluster import direct_client, find_secondaries, get_members, replication_lag
+from load_generator import percentile
+
+# Strongest first; requires_fresh_secondaries marks levels that may read from a secondary
+Level = namedtuple('Level', 'name write_concern read_concern read_preference requires_fresh_secondaries')
+
+# maxStalenessSeconds cannot be lower than 90s, so the driver-side setting is only
+# a backstop; the controller enforces the (usually much smaller) budget itself
+MIN_MAX_STALENESS_SECONDS = 90
+
+
+def default_levels(staleness_budget, wtimeout_ms=1000):
+    max_staleness = max(MIN_MAX_STALENESS_SECONDS, int(staleness_budget))
+    return {
+        "write": [
+            Level("w=majority", WriteConcern(w="majority", wtimeout=wtimeout_ms), None, None, False),
+            Level("w=1", WriteConcern(w=1), None, None, False),
+        ],
+        "read": [
+            Level("primary/majority", None, ReadConcern("majority"), ReadPreference.PRIMARY, False),
+            Level("primary/local", None, ReadConcern("local"), ReadPreference.PRIMARY, False),
+            Level("secondaryPreferred/local", None, ReadConcern("local"),
+                  SecondaryPreferred(max_staleness=max_staleness), True),
+        ],
+    }
+
+
+class LagMonitor(threading.Thread):
+    """Keeps the latest replication lag (seconds) of the slowest secondary"""
+
+    def __init__(self, client, interval=0.25):
+        super().__init__(daemon=True)
+        self.client = client
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.max_lag = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                members = get_members(self.client)
+                primary = next((m for m in members if m['stateStr'] == 'PRIMARY'), None)
+                secondaries = [m for m in members if m['stateStr'] == 'SECONDARY']
+                if primary and secondaries:
+                    self.max_lag = max(replication_lag(primary, m) for m in secondaries)
+                else:
+                    self.max_lag = None
+            except Exception:
+                self.max_lag = None
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+class AdaptiveConsistencyController:
+    """
+    For each operation class ("read", "write") picks the strongest level
+    whose p99 over the last `window` seconds is within that class's SLO.
+    Levels that may read from a secondary are only eligible while every
+    secondary is within the staleness budget (the budget is a hard limit, the
+    SLO is best effort). A level without recent samples counts as within the
+    SLO, so a stronger level is probed again once its old samples age out.
+    `pinned` fixes one level per class (for baselines).
+    """
+
+    def __init__(self, collection, lag_monitor, slos, staleness_budget, window=3.0,
+                 levels=None, pinned=None):
+        self.lag_monitor = lag_monitor
+        self.slos = slos
+        self.staleness_budget = staleness_budget
+        self.window = window
+        self.levels = levels or default_levels(staleness_budget)
+        self.pinned = pinned or {}
+        self.lock = threading.Lock()
+        self.samples = {(op_class, level.name): deque()
+                        for op_class, levels in self.levels.items() for level in levels}
+        self.collections = {
+            level.name: collection.with_options(
+                write_concern=level.write_concern,
+                read_concern=level.read_concern,
+                read_preference=level.read_preference
+            )
+            for levels in self.levels.values() for level in levels
+        }
+        self.current = {}
+        self.decisions = []
+
+    def _p99(self, op_class, level_name, now):
+        samples = self.samples[(op_class, level_name)]
+        while samples and now - samples[0][0] > self.window:
+            samples.popleft()
+        return percentile([latency for _, latency in samples], 99) if samples else None
+
+    def choose(self, op_class):
+        """Return (level, reason) for the next operation of op_class"""
+        levels = self.levels[op_class]
+        if op_class in self.pinned:
+            return next(l for l in levels if l.name == self.pinned[op_class]), "pinned"
+        slo = self.slos[op_class]
+        lag = self.lag_monitor.max_lag
+        now = time.monotonic()
+        reasons = []
+        eligible = []
+        with self.lock:
+            for level in levels:
+                if level.requires_fresh_secondaries and (lag is None or lag > self.staleness_budget):
+                    lag_text = "unknown" if lag is None else f"{lag:.1f}s"
+                    reasons.append(f"{level.name}: lag {lag_text} > budget {self.staleness_budget}s")
+                    continue
+                eligible.append(level)
+                p99 = self._p99(op_class, level.name, now)
+                if p99 is None or p99 <= slo:
+                    return level, "; ".join(reasons) or "within SLO"
+                reasons.append(f"{level.name}: p99 {p99:.1f}ms > SLO {slo}ms")
+        # nothing meets the SLO: weakest level that still respects the staleness budget
+        return eligible[-1], "; ".join(reasons)
+
+    def execute(self, op_class, operation):
+        """Run operation(collection) with the chosen level; returns (result, level name)"""
+        level, reason = self.choose(op_class)
+        if self.current.get(op_class) != level.name:
+            self.current[op_class] = level.name
+            self.decisions.append((time.monotonic(), op_class, level.name, reason))
+        start = time.perf_counter()
+        try:
+            return operation(self.collections[level.name]), level.name
+        finally:
+            latency = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.samples[(op_class, level.name)].append((time.monotonic(), latency))
+
+
+class AdaptiveConsistencyExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.test_collection = self.db['adaptive_consistency_test']
+
+    def _set_locked(self, members, locked):
+        """fsyncLock / fsyncUnlock secondaries; a locked secondary stops applying the oplog"""
+        for name in members:
+            member = direct_client(name)
+            try:
+                if locked:
+                    member.admin.command('fsync', lock=True)
+                else:
+                    while member.admin.command('fsyncUnlock').get('lockCount', 0) > 0:
+                        pass
+            finally:
+                member.close()
+
+    def _run_phase(self, controller, duration, num_keys, write_ratio, acked, versions, rng):
+        """Closed-loop mixed workload; returns per-class latencies, levels used and stale reads"""
+        latencies = {"read": [], "write": []}
+        levels_used = {"read": Counter(), "write": Counter()}
+        errors = 0
+        stale_beyond_budget = 0
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            key = rng.randrange(num_keys)
+            op_class = "write" if rng.random() < write_ratio else "read"
+            start = time.perf_counter()
+            try:
+                if op_class == "write":
+                    version = next(versions)
+                    _, level = controller.execute(op_class, lambda c: c.update_one(
+                        {"_id": key}, {"$set": {"version": version}}, upsert=True))
+                    acked.setdefault(key, []).append((version, time.monotonic()))
+                else:
+                    read_at = time.monotonic()
+                    document, level = controller.execute(op_class, lambda c: c.find_one({"_id": key}))
+                    # newest version acknowledged more than `budget` seconds before the read
+                    required = next((v for v, t in reversed(acked.get(key, []))
+                                     if read_at - t > controller.staleness_budget), 0)
+                    if (document or {}).get("version", 0) < required:
+                        stale_beyond_budget += 1
+            except Exception:
+                errors += 1
+                level = controller.current.get(op_class)
+            latencies[op_class].append((time.perf_counter() - start) * 1000)
+            levels_used[op_class][level] += 1
+        return latencies, levels_used, errors, stale_beyond_budget
+
+    def slo_benchmark(self, slos=None, staleness_budget=2.0, phase_seconds=10,
+                      num_keys=1000, write_ratio=0.3):
+        """
+        Run the same workload through the adaptive controller and a pinned
+        strong baseline while lag is injected: no lag, one secondary
+        fsyncLocked, both secondaries locked (w='majority' cannot be
+        acknowledged), and recovery
+        """
+        slos = slos or {"write": 50, "read": 20}
+        print("\n" + "-"*70)
+        print("Adaptive Consistency Controller under Injected Lag")
+        print("-"*70)
+        print(f"SLO p99: write {slos['write']}ms, read {slos['read']}ms; "
+              f"staleness budget: {staleness_budget}s; phase: {phase_seconds}s")
+
+        secondaries = find_secondaries(self.client)
+        phases = [
+            ("no lag", []),
+            ("1 secondary locked", secondaries[:1]),
+            ("all secondaries locked", secondaries),
+            ("recovered", []),
+        ]
+        modes = [
+            ("strong (pinned)", {"write": "w=majority", "read": "primary/majority"}),
+            ("adaptive", None),
+        ]
+
+        monitor = LagMonitor(self.client)
+        monitor.start()
+        try:
+            for mode, pinned in modes:
+                print(f"\n{'─'*70}")
+                print(f"Mode: {mode}")
+                print(f"{'─'*70}")
+                self.test_collection.drop()
+                controller = AdaptiveConsistencyController(
+                    self.test_collection, monitor, slos, staleness_budget, pinned=pinned)
+                acked = {}
+                versions = itertools.count(1)
+                rng = random.Random(7)
+                mode_start = time.monotonic()
+                print(f"  {'phase':23} {'lag s':>6} {'w p99':>8} {'r p99':>8} {'w SLO':>6} "
+                      f"{'r SLO':>6} {'errors':>7} {'stale':>6}  levels")
+                locked = []
+                try:
+                    for phase, to_lock in phases:
+                        self._set_locked([m for m in locked if m not in to_lock], False)
+                        self._set_locked([m for m in to_lock if m not in locked], True)
+                        locked = list(to_lock)
+                        latencies, levels_used, errors, stale = self._run_phase(
+                            controller, phase_seconds, num_keys, write_ratio, acked, versions, rng)
+                        lag = monitor.max_lag
+                        within = {
+                            op_class: (sum(1 for l in values if l <= slos[op_class]) / len(values)
+                                       if values else 1.0)
+                            for op_class, values in latencies.items()
+                        }
+                        mix = ", ".join(f"{name} {count}" for op_class in ("write", "read")
+                                        for name, count in levels_used[op_class].most_common())
+                        print(f"  {phase:23} {lag if lag is not None else float('nan'):>6.1f} "
+                              f"{percentile(latencies['write'], 99):>8.1f} "
+                              f"{percentile(latencies['read'], 99):>8.1f} "
+                              f"{within['write']:>6.0%} {within['read']:>6.0%} {errors:>7} "
+                              f"{stale:>6}  {mix}")
+                finally:
+                    self._set_locked(locked, False)
+
+                if not pinned:
+                    print(f"\n Decisions:")
+                    for at, op_class, level, reason in controller.decisions:
+                        print(f"   +{at - mode_start:6.2f}s {op_class:5} -> {level:26} ({reason})")
+        finally:
+            monitor.stop()
+
+        print(f"\n Notes:")
+        print(f"   w/r SLO = share of operations within the p99 SLO")
+        print(f"   stale = reads older than a version acknowledged more than {staleness_budget}s earlier")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Adaptive Consistency Controller")
+    print("="*70)
+
+    experiments = AdaptiveConsistencyExperiments()
+
+    try:
+        experiments.slo_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
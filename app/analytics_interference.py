@@ -0,0 +1,257 @@
+"""
+Part D: Analytics-interference Workload
+Runs long aggregation pipelines on secondaries (readConcern snapshot /
+majority) while a write stream runs, and measures the effect on secondary
+oplog apply and on w='majority' / w=3 write latency
+"""
+
+from pymongo import MongoClient, WriteConcern, ReadPreference
+from pymongo.read_concern import ReadConcern
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from cluster import direct_client, find_secondaries, get_members, replication_lag
+from fixtures import Fixtures
+from load_generator import LatencyHistogram
+
+DEFAULT_PIPELINES = [
+    ("revenue by category", [
+        {"$group": {"_id": "$category", "revenue": {"$sum": "$amount"},
+                    "avg": {"$avg": "$amount"}, "users": {"$addToSet": "$user_id"}}},
+        {"$sort": {"revenue": -1}},
+    ]),
+    ("daily active users", [
+        {"$group": {"_id": {"day": "$day", "user": "$user_id"}}},
+        {"$group": {"_id": "$_id.day", "dau": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ]),
+    ("amount histogram", [
+        {"$bucket": {"groupBy": "$amount", "boundaries": [0, 10, 50, 100, 500, 1000, 10000],
+                     "default": "other", "output": {"count": {"$sum": 1}}}},
+    ]),
+]
+
+
+class SecondaryApplyMonitor(threading.Thread):
+    """Samples replication lag of every secondary and their oplog apply counters"""
+
+    def __init__(self, client, interval=0.5):
+        super().__init__(daemon=True)
+        self.client = client
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.lag_samples = {}
+        self.members = {name: direct_client(name) for name in find_secondaries(client)}
+        self.apply_start = {name: self._apply_counters(c) for name, c in self.members.items()}
+
+    @staticmethod
+    def _apply_counters(member):
+        apply = member.admin.command("serverStatus")["metrics"]["repl"]["apply"]
+        return apply["batches"]["totalMillis"], apply["ops"]
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                members = get_members(self.client)
+            except Exception:
+                continue
+            primary = next((m for m in members if m['stateStr'] == 'PRIMARY'), None)
+            if not primary:
+                continue
+            for m in members:
+                if m['stateStr'] == 'SECONDARY':
+                    lag = replication_lag(primary, m) * 1000
+                    self.lag_samples.setdefault(m['name'], []).append(lag)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        report = {}
+        for name, member in self.members.items():
+            millis_start, ops_start = self.apply_start[name]
+            millis, ops = self._apply_counters(member)
+            lags = self.lag_samples.get(name, [0.0])
+            report[name] = {
+                "apply_ms_per_kop": (millis - millis_start) / max(1, ops - ops_start) * 1000,
+                "avg_lag_ms": sum(lags) / len(lags),
+                "max_lag_ms": max(lags),
+            }
+            member.close()
+        return report
+
+
+class AnalyticsInterferenceExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+
+    def seed_events(self, num_docs=200000, batch=5000):
+        """Create the data set scanned by the analytics pipelines"""
+        collection = self.db.get_collection(
+            'analytics_events', write_concern=WriteConcern(w="majority"))
+        if collection.estimated_document_count() >= num_docs:
+            return
+        collection.drop()
+        rng = random.Random(42)
+        categories = ["books", "music", "games", "sports", "garden", "food", "travel"]
+        for start in range(0, num_docs, batch):
+            collection.insert_many([
+                {
+                    "user_id": rng.randrange(20000),
+                    "category": rng.choice(categories),
+                    "amount": round(rng.expovariate(1 / 80), 2),
+                    "day": rng.randrange(365),
+                    "note": "x" * 100
+                }
+                for _ in range(start, min(num_docs, start + batch))
+            ])
+
+    def _analytics_loop(self, read_concern, pipelines, stop_event, results):
+        collection = self.db.get_collection(
+            'analytics_events',
+            read_concern=ReadConcern(read_concern),
+            read_preference=ReadPreference.SECONDARY
+        )
+        i = 0
+        while not stop_event.is_set():
+            name, pipeline = pipelines[i % len(pipelines)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                list(collection.aggregate(pipeline, allowDiskUse=True))
+                results.append((name, (time.perf_counter() - start) * 1000))
+            except Exception as e:
+                results.append((name, None))
+                print(f"   ⚠️  Aggregation '{name}' failed: {str(e)[:80]}")
+                stop_event.wait(1)
+
+    def _write_stream(self, w_value, duration):
+        collection = self.db.get_collection(
+            'analytics_write_stream',
+            write_concern=WriteConcern(w=w_value, j=True, wtimeout=10000)
+        )
+        histogram = LatencyHistogram()
+        errors = 0
+        deadline = time.perf_counter() + duration
+        i = 0
+        while time.perf_counter() < deadline:
+            doc = {
+                "test_id": f"analytics_stream_{w_value}_{i}",
+                "timestamp": datetime.now(),
+                "data": "x" * 1000  # 1KB data
+            }
+            i += 1
+            start = time.perf_counter()
+            try:
+                collection.insert_one(doc)
+                histogram.record((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+        return histogram, errors
+
+    def _phase(self, w_value, duration, analytics_threads, read_concern, pipelines):
+        self.fixtures.reset('analytics_write_stream')
+        self.fixtures.settle()
+        stop_event = threading.Event()
+        agg_results = []
+        threads = [
+            threading.Thread(target=self._analytics_loop,
+                             args=(read_concern, pipelines, stop_event, agg_results), daemon=True)
+            for _ in range(analytics_threads)
+        ]
+        monitor = SecondaryApplyMonitor(self.client)
+        monitor.start()
+        for t in threads:
+            t.start()
+        try:
+            time.sleep(1 if threads else 0)  # let the aggregations get going
+            histogram, errors = self._write_stream(w_value, duration)
+        finally:
+            stop_event.set()
+            for t in threads:
+                t.join()
+            apply = monitor.stop()
+        return histogram, errors, apply, agg_results
+
+    def interference_test(self, write_concerns=(1, "majority", 3), read_concerns=("majority", "snapshot"),
+                          analytics_threads=4, duration=15, pipelines=None):
+        """
+        For each write concern: run the write stream alone, then with
+        `analytics_threads` aggregation loops on secondaries for each read
+        concern, and compare write latency, replication lag and apply cost
+        """
+        print("\n" + "-"*70)
+        print("Analytics Interference: Aggregations on Secondaries During Writes")
+        print("-"*70)
+
+        pipelines = pipelines or DEFAULT_PIPELINES
+        print(" Seeding analytics data set...")
+        self.seed_events()
+        print(f" Pipelines: {', '.join(name for name, _ in pipelines)}")
+        print(f" Analytics threads: {analytics_threads}, write phase: {duration}s")
+
+        for w_value in write_concerns:
+            print(f"\n{'─'*70}")
+            print(f"Test Configuration: w={w_value}")
+            print(f"{'─'*70}")
+            print(f"  {'analytics':18} {'writes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} "
+                  f"{'max lag ms':>11} {'apply ms/kop':>13} {'aggs':>5}")
+
+            scenarios = [("none", 0, None)] + [(f"readConcern {rc}", analytics_threads, rc)
+                                              for rc in read_concerns]
+            baseline_p99 = None
+            for label, threads, read_concern in scenarios:
+                histogram, errors, apply, agg_results = self._phase(
+                    w_value, duration, threads, read_concern, pipelines)
+                latency = histogram.summary()
+                max_lag = max((a["max_lag_ms"] for a in apply.values()), default=0.0)
+                apply_cost = max((a["apply_ms_per_kop"] for a in apply.values()), default=0.0)
+                completed_aggs = sum(1 for _, ms in agg_results if ms is not None)
+                print(f"  {label:18} {latency['count'] / duration:>9.1f} {latency['p50']:>8.2f} "
+                      f"{latency['p99']:>8.2f} {errors:>7} {max_lag:>11.0f} {apply_cost:>13.1f} "
+                      f"{completed_aggs:>5}")
+                if baseline_p99 is None:
+                    baseline_p99 = latency['p99']
+                elif baseline_p99:
+                    print(f"  {'':18} p99 write latency x{latency['p99'] / baseline_p99:.2f} vs no analytics")
+
+        print(f"\n Notes:")
+        print(f"   max lag      = worst secondary optime lag behind the primary during the phase")
+        print(f"   apply ms/kop = secondary oplog batch apply time per 1000 ops (serverStatus)")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Analytics-interference Workload")
+    print("="*70)
+
+    experiments = AnalyticsInterferenceExperiments()
+
+    try:
+        experiments.interference_test()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
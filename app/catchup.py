@@ -0,0 +1,256 @@
+"""
+Part D: Secondary Catch-up and Oplog Window
+Takes one secondary offline, writes at a fixed rate for the outage, brings
+it back and measures catch-up throughput (oplog entries/s), the time until
+it is back within the lag threshold and primary w='majority' latency while
+it catches up. The oplog window from local.oplog.rs shows whether an outage
+of that length would have forced a full resync.
+"""
+
+from pymongo import MongoClient, WriteConcern
+from pymongo.errors import PyMongoError
+import os
+import threading
+import time
+import traceback
+
+from cluster import direct_client, find_secondaries, get_members, replication_lag
+from load_generator import LatencyHistogram, OpenLoopGenerator
+
+
+def oplog_window(client):
+    """First/last oplog timestamps, window in seconds and size of the oplog on the primary"""
+    local = client['local']
+    first = local['oplog.rs'].find_one({}, {"ts": 1}, sort=[("$natural", 1)])['ts']
+    last = local['oplog.rs'].find_one({}, {"ts": 1}, sort=[("$natural", -1)])['ts']
+    stats = local.command('collStats', 'oplog.rs')
+    return {
+        "first": first,
+        "last": last,
+        "window": last.time - first.time,
+        "size": stats['size'],
+        "max_size": stats['maxSize'],
+        "avg_entry": stats.get('avgObjSize', 0),
+    }
+
+
+class MajorityProbe(threading.Thread):
+    """w='majority' inserts at a fixed rate until stopped"""
+
+    def __init__(self, collection, rate):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.interval = 1.0 / rate
+        self.stop_event = threading.Event()
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+
+    def run(self):
+        next_at = time.perf_counter()
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                self.collection.insert_one({"probe": True, "sent_at": time.time()})
+                self.histogram.record((time.perf_counter() - start) * 1000)
+            except PyMongoError:
+                self.errors += 1
+            next_at += self.interval
+            self.stop_event.wait(max(0.0, next_at - time.perf_counter()))
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        return self.histogram
+
+
+class CatchUpExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.test_collection = self.db.get_collection('catchup_test', write_concern=WriteConcern(w=1))
+        self.majority_collection = self.db.get_collection(
+            'catchup_test', write_concern=WriteConcern(w="majority", wtimeout=60000))
+
+    def _status(self, host):
+        members = get_members(self.client)
+        primary = next((m for m in members if m['stateStr'] == 'PRIMARY'), None)
+        member = next((m for m in members if m['name'] == host), None)
+        return primary, member
+
+    def _take_offline(self, host, outage):
+        """
+        lock: fsyncLock, the member stays up but applies nothing; shutdown: stop
+        the mongod. Returns the member's own last applied optime, read before
+        the outage (the primary reports Timestamp(0, 0) for a member it sees down)
+        """
+        member = direct_client(host)
+        try:
+            stalled_at = member.admin.command('replSetGetStatus')['optimes']['appliedOpTime']['ts']
+            if outage == 'lock':
+                member.admin.command('fsync', lock=True)
+            else:
+                try:
+                    member.admin.command('shutdown', force=True)
+                except PyMongoError:
+                    pass  # the connection drops as the member exits
+        finally:
+            member.close()
+        return stalled_at
+
+    def _bring_back(self, host, outage, restart):
+        if outage == 'lock':
+            member = direct_client(host)
+            try:
+                while member.admin.command('fsyncUnlock').get('lockCount', 0) > 0:
+                    pass
+            finally:
+                member.close()
+        else:
+            restart(host)
+
+    def _wait_caught_up(self, host, target, lag_threshold, timeout):
+        """Seconds until the member's lag is within lag_threshold and until it has applied `target`"""
+        started = time.monotonic()
+        within = caught_up = None
+        while time.monotonic() - started < timeout:
+            primary, member = self._status(host)
+            if primary and member and member.get('health') == 1 and member['stateStr'] == 'SECONDARY':
+                elapsed = time.monotonic() - started
+                if within is None and replication_lag(primary, member) <= lag_threshold:
+                    within = elapsed
+                if member['optime']['ts'] >= target:
+                    caught_up = elapsed
+                    within = within if within is not None else elapsed
+                    break
+            time.sleep(0.1)
+        return within, caught_up
+
+    def catchup_benchmark(self, outage='lock', restart=None, write_rate=500, duration=30,
+                          lag_threshold=1.0, probe_rate=20, baseline_seconds=5, timeout=600):
+        """
+        Baseline w='majority' latency, then one secondary offline while inserts
+        run at `write_rate`/s for `duration` seconds, then catch-up with the
+        w='majority' probe running. outage='shutdown' needs `restart(host)`
+        (e.g. LocalCluster.restart_member) to start the member again.
+        """
+        print("\n" + "-"*70)
+        print("Secondary Catch-up and Oplog Window")
+        print("-"*70)
+        if outage == 'shutdown' and restart is None:
+            print("❌ outage='shutdown' needs a restart hook (e.g. LocalCluster.restart_member); "
+                  "use outage='lock' against docker-compose")
+            return None
+
+        self.test_collection.drop()
+        self.db.create_collection(self.test_collection.name)
+        host = find_secondaries(self.client)[-1]
+        before = oplog_window(self.client)
+        print(f"Member taken offline: {host} ({outage}); load: {write_rate} inserts/s (w=1) for {duration}s")
+        print(f"Oplog before: window {before['window']}s, {before['size'] / 2**20:.0f} of "
+              f"{before['max_size'] / 2**20:.0f} MB")
+
+        probe = MajorityProbe(self.majority_collection, probe_rate)
+        probe.start()
+        time.sleep(baseline_seconds)
+        baseline = probe.stop()
+
+        payload = "x" * 1000  # 1KB data
+        restored = False
+        stalled_at = self._take_offline(host, outage)
+        try:
+            outage_started = time.monotonic()
+            result = OpenLoopGenerator(
+                lambda i: self.test_collection.insert_one({"seq": i, "data": payload}),
+                rate=write_rate, duration=duration, max_workers=64).run()
+            outage_seconds = time.monotonic() - outage_started
+
+            after = oplog_window(self.client)
+            behind = self.client['local']['oplog.rs'].count_documents(
+                {"ts": {"$gt": stalled_at, "$lte": after['last']}})
+            fell_off = after['first'] > stalled_at
+
+            probe = MajorityProbe(self.majority_collection, probe_rate)
+            probe.start()
+            self._bring_back(host, outage, restart)
+            restored = True
+            within, caught_up = self._wait_caught_up(host, after['last'], lag_threshold, timeout)
+            during = probe.stop()
+        finally:
+            if not restored:
+                self._bring_back(host, outage, restart)
+
+        entry_rate = behind / outage_seconds if outage_seconds else 0.0
+        projected = after['max_size'] / (entry_rate * after['avg_entry']) if entry_rate and after['avg_entry'] else None
+
+        print(f"\n{'─'*70}")
+        print(f"Outage")
+        print(f"{'─'*70}")
+        print(f"  duration:                {outage_seconds:>10.1f} s")
+        print(f"  writes completed:        {result['completed']:>10} ({result['errors']} errors)")
+        print(f"  oplog entries behind:    {behind:>10}")
+
+        print(f"\n{'─'*70}")
+        print(f"Catch-up")
+        print(f"{'─'*70}")
+        if caught_up is None:
+            print(f"  ❌ not caught up within {timeout}s")
+        else:
+            print(f"  {f'within {lag_threshold:g}s lag after:':25}{within:>10.2f} s")
+            print(f"  fully caught up after:   {caught_up:>10.2f} s")
+            print(f"  catch-up throughput:     {behind / caught_up if caught_up else float('inf'):>10.0f} entries/s "
+                  f"(load generated {entry_rate:.0f} entries/s)")
+
+        print(f"\n  {'w=majority probe':20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+        for label, histogram, errors in (("baseline", baseline, 0), ("during catch-up", during, probe.errors)):
+            summary = histogram.summary()
+            print(f"  {label:20} {summary['p50']:>8.2f} {summary['p95']:>8.2f} {summary['p99']:>8.2f} "
+                  f"{summary['max']:>8.2f} {errors:>7}")
+
+        print(f"\n{'─'*70}")
+        print(f"Oplog Window")
+        print(f"{'─'*70}")
+        print(f"  after the outage:        {after['window']:>10} s")
+        if projected is not None:
+            print(f"  at this write rate:      {projected:>10.0f} s (oplog max {after['max_size'] / 2**20:.0f} MB)")
+        if fell_off:
+            print(f"  ⚠️  {host} fell off the oplog: its last applied entry was overwritten, it needs a full resync")
+        elif projected is not None and outage_seconds > projected:
+            print(f"  ⚠️  outage longer than the projected oplog window; a member down this long would need a full resync")
+        else:
+            print(f"  ✅ outage within the oplog window")
+
+        print(f"\n Notes:")
+        print(f"   lock = fsyncLock (member up but applying nothing); shutdown = mongod stopped and restarted")
+        print(f"   majority = primary + the healthy secondary, so the probe shows the cost of serving the catch-up")
+        print("="*70)
+        return {"behind": behind, "within": within, "caught_up": caught_up, "fell_off": fell_off}
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Secondary Catch-up and Oplog Window")
+    print("="*70)
+
+    experiments = CatchUpExperiments()
+
+    try:
+        experiments.catchup_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Causal-order Checker
+Checks one member's copy of an operation history in the order the member
+applied it (experiment 4 schema: op_key = writer << 32 | seq,
+depends_on = [op_key, ...]). A first pass builds a per-writer index of apply
+positions (4 bytes per operation, ~40 MB per 10^7 operations); a second pass
+flags every operation whose dependency was applied after it or is absent.
+"""
+
+from array import array
+from itertools import repeat
+import random
+import time
+import tracemalloc
+
+from cluster import direct_client
+from raw_reads import raw_collection, timed_field
+
+SEQ_MASK = 0xFFFFFFFF
+
+
+def format_op_key(op_key):
+    return f"writer {op_key >> 32} op {op_key & SEQ_MASK}"
+
+
+class PositionIndex:
+    """writer -> array of apply position + 1 indexed by seq (0 = not applied)"""
+
+    def __init__(self):
+        self.writers = {}
+        self.size = 0
+        self.duplicates = 0
+
+    def add(self, op_key):
+        """Record op_key at the next apply position; a repeat keeps its first position"""
+        positions = self.writers.get(op_key >> 32)
+        if positions is None:
+            positions = self.writers[op_key >> 32] = array('I')
+        seq = op_key & SEQ_MASK
+        if seq >= len(positions):
+            positions.extend(repeat(0, max(seq + 1 - len(positions), len(positions))))
+        if positions[seq]:
+            self.duplicates += 1
+        else:
+            positions[seq] = self.size + 1
+        self.size += 1
+
+    def get(self, op_key):
+        """Apply position of op_key, or None if the member never applied it"""
+        positions = self.writers.get(op_key >> 32)
+        seq = op_key & SEQ_MASK
+        if positions is None or seq >= len(positions) or not positions[seq]:
+            return None
+        return positions[seq] - 1
+
+
+class CausalChecker:
+    """
+    Feed every operation to index() in apply order, then to check() (any
+    order). A dependency applied after its dependent counts as out of order,
+    an absent one as missing; both are reported to
+    on_violation(op_key, dependency, position, dependency_position) with
+    dependency_position None when missing.
+    """
+
+    def __init__(self, on_violation=None):
+        self.on_violation = on_violation
+        self.positions = PositionIndex()
+        self.operations = 0
+        self.edges = 0
+        self.out_of_order = 0
+        self.missing = 0
+
+    def index(self, op_key):
+        self.positions.add(op_key)
+
+    def check(self, op_key, depends_on):
+        position = self.positions.get(op_key)
+        for dependency in depends_on:
+            self.edges += 1
+            dependency_position = self.positions.get(dependency)
+            if dependency_position is None:
+                self.missing += 1
+            elif dependency_position > position:
+                self.out_of_order += 1
+            else:
+                continue
+            if self.on_violation:
+                self.on_violation(op_key, dependency, position, dependency_position)
+        self.operations += 1
+
+    def finish(self):
+        return {
+            "operations": self.operations,
+            "edges": self.edges,
+            "violations": self.out_of_order + self.missing,
+            "out_of_order": self.out_of_order,
+            "missing": self.missing,
+            "duplicates": self.positions.duplicates,
+        }
+
+
+def check_member(host, database, collection_name, batch_size=10000, on_violation=None, raw=False):
+    """
+    Check one member's copy of the history in its own apply order: $natural
+    order on a secondary is the order it inserted the replicated documents.
+    Two passes, index then check. The result adds scan_ms (both passes) and,
+    with raw=True (RawBSONDocument batches), decode_ms: the field decode part
+    """
+    client = direct_client(host)
+    try:
+        checker = CausalChecker(on_violation)
+        collection = client[database][collection_name]
+        if raw:
+            collection = raw_collection(collection)
+        decode_ms = 0.0 if raw else None
+
+        def scan(fields):
+            nonlocal decode_ms
+            for op in collection.find({}, fields, batch_size=batch_size).sort("$natural", 1):
+                if raw:
+                    op_key, op_decode_ms = timed_field(op, "op_key")
+                    decode_ms += op_decode_ms
+                else:
+                    op_key = op["op_key"]
+                yield op_key, op
+
+        start = time.perf_counter()
+        for op_key, _ in scan({"_id": 0, "op_key": 1}):
+            checker.index(op_key)
+        for op_key, op in scan({"_id": 0, "op_key": 1, "depends_on": 1}):
+            checker.check(op_key, op["depends_on"])
+        result = checker.finish()
+        result["scan_ms"] = (time.perf_counter() - start) * 1000
+        result["decode_ms"] = decode_ms
+        return result
+    finally:
+        client.close()
+
+
+def synthetic_history(num_ops, num_writers=8, dependency_ratio=0.3, seed=1):
+    """In-memory history shaped like experiment 4's, already in causal order"""
+    rng = random.Random(seed)
+    next_seq = [0] * num_writers
+    for _ in range(num_ops):
+        writer = rng.randrange(num_writers)
+        seq = next_seq[writer]
+        next_seq[writer] += 1
+        depends_on = [writer << 32 | (seq - 1)] if seq else []
+        other = rng.randrange(num_writers)
+        if other != writer and next_seq[other] and rng.random() < dependency_ratio:
+            depends_on.append(other << 32 | (next_seq[other] - 1))
+        yield writer << 32 | seq, depends_on
+
+
+def main():
+    """Checker throughput and peak memory on synthetic histories (no database needed)"""
+    print("="*70)
+    print("Causal-order Checker (synthetic histories)")
+    print("="*70)
+    print(f"  {'operations':>11} {'edges':>11} {'violations':>11} {'ops/s':>11} {'peak MB':>8}")
+    for num_ops in (10**5, 10**6, 10**7):
+        checker = CausalChecker()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for op_key, _ in synthetic_history(num_ops):
+            checker.index(op_key)
+        for op_key, depends_on in synthetic_history(num_ops):
+            checker.check(op_key, depends_on)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result = checker.finish()
+        print(f"  {result['operations']:>11} {result['edges']:>11} {result['violations']:>11} "
+              f"{num_ops / elapsed:>11.0f} {peak / 2**20:>8.2f}")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Part D: Change-stream Fan-out Benchmark
+Opens 1..1000 concurrent change-stream watchers (threads) spread over the
+primary and secondaries while inserts arrive at a fixed rate, and measures
+event delivery latency, per-watcher throughput and the effect of the
+watcher count on write latency for each write concern
+"""
+
+from pymongo import MongoClient, WriteConcern
+import os
+import threading
+import time
+import traceback
+
+from cluster import direct_client, find_primary, find_secondaries
+from load_generator import LatencyHistogram, OpenLoopGenerator
+
+
+class Watcher(threading.Thread):
+    """Watches inserts on one member; delivery latency = receive time - sent_at"""
+
+    def __init__(self, collection, ready, stop_event):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.ready = ready
+        self.stop_event = stop_event
+        self.histogram = LatencyHistogram()
+        self.events = 0
+        self.error = None
+
+    def run(self):
+        try:
+            with self.collection.watch([{"$match": {"operationType": "insert"}}],
+                                       max_await_time_ms=100) as stream:
+                self.ready.release()
+                while not self.stop_event.is_set():
+                    change = stream.try_next()
+                    if change is not None:
+                        self.histogram.record((time.time() - change["fullDocument"]["sent_at"]) * 1000)
+                        self.events += 1
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.ready.release()
+
+
+class ChangeStreamFanoutExperiments:
+    # (label, write concern)
+    WRITE_CONCERNS = [
+        ("w=1", WriteConcern(w=1)),
+        ("w=majority", WriteConcern(w="majority", wtimeout=10000)),
+    ]
+
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+
+    def _start_watchers(self, count, members, stop_event, timeout=60):
+        """Round-robin `count` watchers over the members; one client per member"""
+        per_member = {m: (count + len(members) - 1 - i) // len(members) for i, m in enumerate(members)}
+        clients = [direct_client(m, maxPoolSize=n + 5) for m, n in per_member.items() if n]
+        ready = threading.Semaphore(0)
+        watchers = []
+        for i in range(count):
+            client = clients[i % len(clients)]
+            watcher = Watcher(client[self.db.name]['change_stream_test'], ready, stop_event)
+            watcher.start()
+            watchers.append(watcher)
+        deadline = time.monotonic() + timeout
+        for _ in watchers:
+            if not ready.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                break
+        return watchers, clients
+
+    def fanout_benchmark(self, watcher_counts=(1, 10, 100, 500, 1000), write_rate=200,
+                         duration=10, drain_seconds=2, max_delivery_p99_ms=1000):
+        """
+        For every watcher count and write concern: open the watchers, insert at
+        `write_rate`/s for `duration` seconds (open loop), wait for delivery to
+        drain, then report delivery latency, per-watcher throughput, delivered
+        share and write latency. A write concern stops at the first count that
+        misses the SLO; its capacity is the last count that met it
+        """
+        print("\n" + "-"*70)
+        print("Change-stream Fan-out")
+        print("-"*70)
+        members = [find_primary(self.client)] + find_secondaries(self.client)
+        print(f"Members: {', '.join(members)}; write rate: {write_rate}/s for {duration}s; "
+              f"watchers spread round-robin over all members")
+
+        print(f"\n  {'watchers':>8} {'write':11} {'deliv p50':>10} {'p95':>8} {'p99':>9} {'delivered':>10} "
+              f"{'ev/s/watcher':>13} {'write p50':>10} {'write p99':>10}")
+        capacity = {}
+        missed_at = {}  # label -> first watcher count that missed the SLO; larger counts are skipped
+        for count in watcher_counts:
+            for label, write_concern in self.WRITE_CONCERNS:
+                if label in missed_at:
+                    continue
+                collection = self.db.get_collection('change_stream_test', write_concern=write_concern)
+                collection.drop()
+                self.db.create_collection('change_stream_test')
+
+                stop_event = threading.Event()
+                watchers, clients = self._start_watchers(count, members, stop_event)
+                try:
+                    generator = OpenLoopGenerator(
+                        lambda i: collection.insert_one({"seq": i, "sent_at": time.time()}),
+                        rate=write_rate, duration=duration, max_workers=64)
+                    result = generator.run()
+                    time.sleep(drain_seconds)
+                finally:
+                    stop_event.set()
+                    for watcher in watchers:
+                        watcher.join()
+                    for client in clients:
+                        client.close()
+
+                delivery = LatencyHistogram()
+                for watcher in watchers:
+                    delivery.merge(watcher.histogram)
+                failed = sum(1 for w in watchers if w.error)
+                expected = result["completed"] * count
+                delivered = delivery.count / expected if expected else 0.0
+                per_watcher = delivery.count / count / duration
+                writes = result["latency"]
+                print(f"  {count:>8} {label:11} {delivery.percentile(50):>10.1f} {delivery.percentile(95):>8.1f} "
+                      f"{delivery.percentile(99):>9.1f} {delivered:>10.1%} {per_watcher:>13.1f} "
+                      f"{writes['p50']:>10.2f} {writes['p99']:>10.2f}"
+                      + (f"  ({failed} watchers failed: {next(w.error for w in watchers if w.error)[:40]})"
+                         if failed else ""))
+
+                if delivered >= 0.999 and delivery.percentile(99) <= max_delivery_p99_ms and not failed:
+                    capacity[label] = count
+                else:
+                    missed_at[label] = count
+            if len(missed_at) == len(self.WRITE_CONCERNS):
+                break
+
+        print(f"\n Fan-out Capacity (delivered ≥ 99.9%, delivery p99 ≤ {max_delivery_p99_ms}ms):")
+        for label, _ in self.WRITE_CONCERNS:
+            served = capacity.get(label)
+            print(f"   {label:11} -> {f'{served} watchers' if served else f'below {watcher_counts[0]} watchers'}"
+                  f" at {write_rate} writes/s"
+                  + (f" (missed at {missed_at[label]})" if label in missed_at else " (no count missed)"))
+        print(f"\n Notes:")
+        print(f"   delivery latency in ms from insert to event on the watcher (same host clock)")
+        print(f"   write latency includes queueing (open loop at a fixed rate)")
+        print("="*70)
+        return capacity
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Change-stream Fan-out Benchmark")
+    print("="*70)
+
+    experiments = ChangeStreamFanoutExperiments()
+
+    try:
+        experiments.fanout_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Part D: Repeated-failover Chaos Loop
+Runs a steady mixed workload while triggering primary stepdowns across many
+cycles, and reports availability and outage distributions
+"""
+
+from pymongo import MongoClient, WriteConcern, ReadPreference
+from pymongo.read_concern import ReadConcern
+from pymongo.errors import ConnectionFailure, OperationFailure
+import bisect
+import itertools
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from cluster import direct_client, preferred_primary
+from fixtures import Fixtures
+from load_generator import percentile
+from topology_watcher import TopologyWatcher
+
+
+class MixedWorkload:
+    """
+    Background writer/reader threads that log (start, end, kind, ok) for
+    every operation. Short server selection timeouts make an unavailable
+    primary show up as failed operations instead of one long block.
+    """
+
+    def __init__(self, connection_string, workers=4, read_ratio=0.5, op_timeout_ms=1000):
+        self.client = MongoClient(
+            connection_string,
+            serverSelectionTimeoutMS=op_timeout_ms,
+            socketTimeoutMS=op_timeout_ms * 5
+        )
+        db = self.client['lab2_distributed_db']
+        self.write_collection = db.get_collection(
+            'chaos_test',
+            write_concern=WriteConcern(w="majority", wtimeout=op_timeout_ms * 5)
+        )
+        self.read_collection = db.get_collection(
+            'chaos_test',
+            read_concern=ReadConcern("majority"),
+            read_preference=ReadPreference.PRIMARY
+        )
+        self.workers = workers
+        self.read_ratio = read_ratio
+        self.op_timeout = op_timeout_ms / 1000
+        self.log = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.seq = itertools.count()
+
+    def _loop(self, worker_id):
+        rng = random.Random(worker_id)
+        local = []
+        while not self.stop_event.is_set():
+            kind = "read" if rng.random() < self.read_ratio else "write"
+            start = time.time()
+            try:
+                if kind == "write":
+                    self.write_collection.insert_one({
+                        "seq": next(self.seq),
+                        "worker": worker_id,
+                        "timestamp": datetime.now()
+                    })
+                else:
+                    self.read_collection.find_one({"worker": worker_id})
+                ok = True
+            except (ConnectionFailure, OperationFailure):
+                ok = False
+            end = time.time()
+            local.append((start, end, kind, ok))
+            if not ok:
+                # avoid spinning on immediate errors (e.g. NotPrimary)
+                time.sleep(max(0.0, 0.05 - (end - start)))
+            if len(local) >= 100:
+                with self.lock:
+                    self.log.extend(local)
+                local = []
+        with self.lock:
+            self.log.extend(local)
+
+    def start(self):
+        for w in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(w,), daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        self.stop_event.set()
+        for t in self.threads:
+            t.join(timeout=self.op_timeout * 10)
+        self.client.close()
+        with self.lock:
+            return sorted(self.log)
+
+
+class ChaosExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.topology = TopologyWatcher()
+        self.client = MongoClient(
+            self.connection_string,
+            serverSelectionTimeoutMS=2000,
+            event_listeners=[self.topology],
+            heartbeatFrequencyMS=500
+        )
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+
+    def _current_primary(self):
+        return self.topology.wait_for_primary(timeout=10)
+
+    def _wait_for_primary(self, predicate, timeout):
+        """Wait for the driver to see a primary matching predicate; returns elapsed seconds or None"""
+        start = time.time()
+        if self.topology.wait_until(predicate, timeout) is None:
+            return None
+        return time.time() - start
+
+    def _trigger(self, method, primary, stepdown_secs, freeze_secs):
+        """
+        stepdown: replSetStepDown keeps the old primary ineligible for
+                  stepdown_secs
+        freeze:   replSetStepDown followed by replSetFreeze on the old primary,
+                  so the freeze (not the stepdown timer) decides how long it
+                  stays out of elections
+        """
+        try:
+            self.client.admin.command(
+                'replSetStepDown', stepdown_secs,
+                secondaryCatchUpPeriodSecs=max(0, min(10, stepdown_secs - 1))
+            )
+        except ConnectionFailure:
+            pass  # expected: connections to the old primary may be closed
+        if method == "freeze":
+            member = direct_client(primary, serverSelectionTimeoutMS=5000)
+            try:
+                member.admin.command('replSetFreeze', freeze_secs)
+            finally:
+                member.close()
+
+    def _unfreeze(self, host):
+        member = direct_client(host, serverSelectionTimeoutMS=5000)
+        try:
+            member.admin.command('replSetFreeze', 0)
+        except OperationFailure:
+            pass  # not frozen or already primary
+        finally:
+            member.close()
+
+    def _outage(self, log, kind, trigger, window):
+        """
+        Gap in successful `kind` operations around the trigger: from the last
+        success before the first failure to the first success after it.
+        Returns (gap seconds, recovered at), (0.0, trigger) if nothing failed,
+        or None if no operation succeeded again within the window
+        """
+        ops = [entry for entry in log if entry[2] == kind and entry[1] >= trigger - window]
+        failure = next((entry for entry in ops
+                        if not entry[3] and trigger <= entry[1] <= trigger + window), None)
+        if failure is None:
+            return 0.0, trigger
+        fail_start, fail_end = failure[0], failure[1]
+        before = [end for start, end, _, ok in ops if ok and end <= fail_end]
+        after = [end for start, end, _, ok in ops if ok and start >= fail_start]
+        if not after:
+            return None
+        last_ok = max(before) if before else fail_start
+        recovered = min(after)
+        return recovered - last_ok, recovered
+
+    def _throughput(self, log, begin, end):
+        ok = sum(1 for start, finish, _, success in log if success and begin <= finish < end)
+        return ok / (end - begin) if end > begin else 0.0
+
+    def failover_chaos(self, cycles=5, interval=30, method="stepdown", stepdown_secs=10,
+                       freeze_secs=10, workers=4, read_ratio=0.5, wait_for_original=True,
+                       recovery_window=5):
+        """
+        Run `cycles` failovers `interval` seconds apart under a steady
+        w='majority' / readConcern 'majority' workload, optionally waiting for
+        the highest-priority member (mongo1) to take the primary back.
+        """
+        print("\n" + "-"*70)
+        print("Repeated-failover Chaos Loop")
+        print("-"*70)
+
+        if method not in ("stepdown", "freeze"):
+            raise ValueError(f"Unknown stepdown method: {method}")
+
+        original = preferred_primary(self.client)
+        print(f"Method: {method}, cycles: {cycles}, interval: {interval}s, workers: {workers}")
+        print(f"Preferred primary (highest priority): {original}")
+
+        self.fixtures.reset('chaos_test')
+        self.fixtures.settle()
+        workload = MixedWorkload(self.connection_string, workers=workers, read_ratio=read_ratio)
+        workload.start()
+        cycle_results = []
+        try:
+            time.sleep(min(interval, 5))  # warm-up
+            for cycle in range(1, cycles + 1):
+                cycle_start = time.time()
+                primary = self._current_primary()
+                print(f"\n Cycle {cycle}/{cycles}: primary {primary}")
+
+                trigger = time.time()
+                self._trigger(method, primary, stepdown_secs, freeze_secs)
+                election = self._wait_for_primary(lambda p: p != primary, timeout=60)
+                new_primary = self._current_primary()
+                election_text = f"{election:.2f}s" if election is not None else "timeout"
+                print(f"   New primary: {new_primary} (seen after {election_text})")
+
+                takeback = None
+                if wait_for_original and new_primary != original:
+                    takeback = self._wait_for_primary(
+                        lambda p: p == original,
+                        timeout=max(stepdown_secs, freeze_secs) + 120
+                    )
+                    takeback_text = (f"{time.time() - trigger:.2f}s after trigger"
+                                     if takeback is not None else "timeout")
+                    print(f"   {original} took primary back: {takeback_text}")
+
+                cycle_results.append({"trigger": trigger, "election": election,
+                                      "takeback": takeback})
+                time.sleep(max(0.0, interval - (time.time() - cycle_start)))
+        finally:
+            log = workload.stop()
+            if method == "freeze":
+                self._unfreeze(original)
+
+        self._report(log, cycle_results, interval, recovery_window)
+
+    def _report(self, log, cycle_results, interval, recovery_window):
+        print(f"\n Availability Report:")
+        for kind in ("write", "read"):
+            attempted = [entry for entry in log if entry[2] == kind]
+            succeeded = sum(1 for entry in attempted if entry[3])
+            pct = succeeded / len(attempted) * 100 if attempted else 0.0
+            print(f"   {kind.capitalize():5} availability: {pct:.2f}% "
+                  f"({succeeded}/{len(attempted)} operations succeeded)")
+
+        print(f"\n Outage Durations (last success before the first failure → first success after it):")
+        for kind in ("write", "read"):
+            outages = [self._outage(log, kind, c["trigger"], interval) for c in cycle_results]
+            measured = [o[0] for o in outages if o is not None]
+            if measured:
+                print(f"   {kind.capitalize():5} min {min(measured):.2f}s, "
+                      f"p50 {percentile(measured, 50):.2f}s, "
+                      f"p95 {percentile(measured, 95):.2f}s, max {max(measured):.2f}s")
+            if len(measured) < len(outages):
+                print(f"   {kind.capitalize():5} {len(outages) - len(measured)} cycle(s) did not recover "
+                      f"within {interval}s")
+
+        elections = [c["election"] for c in cycle_results if c["election"] is not None]
+        if elections:
+            print(f"\n Election detected: p50 {percentile(elections, 50):.2f}s, "
+                  f"max {max(elections):.2f}s")
+
+        print(f"\n Recovery Throughput (first {recovery_window}s after writes recover vs "
+              f"{recovery_window}s before trigger):")
+        for i, c in enumerate(cycle_results, 1):
+            outage = self._outage(log, "write", c["trigger"], interval)
+            before = self._throughput(log, c["trigger"] - recovery_window, c["trigger"])
+            if outage is None:
+                print(f"   Cycle {i}: no recovery observed (baseline {before:.1f} ops/s)")
+                continue
+            recovered = outage[1]
+            after = self._throughput(log, recovered, recovered + recovery_window)
+            ratio = after / before * 100 if before else 0.0
+            print(f"   Cycle {i}: {before:.1f} → {after:.1f} ops/s ({ratio:.0f}% of baseline)")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Repeated-failover Chaos Loop")
+    print("="*70)
+
+    experiments = ChaosExperiments()
+
+    try:
+        experiments.failover_chaos()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
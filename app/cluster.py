@@ -0,0 +1,45 @@
+"""
+Replica set member helpers shared by the Part D experiments
+"""
+
+from pymongo import MongoClient
+
+
+def get_members(client):
+    """Members of the replica set as reported by replSetGetStatus"""
+    return client.admin.command("replSetGetStatus")['members']
+
+
+def find_primary(client):
+    """Name (host:port) of the current primary, or None during an election"""
+    for member in get_members(client):
+        if member['stateStr'] == 'PRIMARY':
+            return member['name']
+    return None
+
+
+def find_secondaries(client):
+    return [m['name'] for m in get_members(client) if m['stateStr'] == 'SECONDARY']
+
+
+def preferred_primary(client):
+    """Member with the highest configured priority (mongo1, priority 2)"""
+    config = client.admin.command("replSetGetConfig")
+    return max(config['config']['members'], key=lambda m: m.get('priority', 1))['host']
+
+
+def replication_lag(primary, member):
+    """
+    Seconds `member` is behind `primary` (replSetGetStatus entries), from
+    lastAppliedWallTime (ms resolution); optimeDate only has whole seconds
+    """
+    if 'lastAppliedWallTime' in primary and 'lastAppliedWallTime' in member:
+        lag = primary['lastAppliedWallTime'] - member['lastAppliedWallTime']
+    else:
+        lag = primary['optimeDate'] - member['optimeDate']
+    return max(0.0, lag.total_seconds())
+
+
+def direct_client(host, **options):
+    """Client connected to a single member, bypassing server selection"""
+    return MongoClient(host, directConnection=True, **options)
@@ -0,0 +1,204 @@
+"""
+Part D: Wire Compression Benchmark
+Runs the write-concern and read experiments with different driver
+`compressors` settings and compares latency, throughput, client CPU and
+bytes on the wire
+"""
+
+from pymongo import MongoClient, WriteConcern
+from bson.binary import Binary
+import importlib.util
+import os
+import random
+import time
+import traceback
+from datetime import datetime
+
+from fixtures import Fixtures
+from load_generator import LatencyHistogram
+
+WORDS = ("user profile session dublin beijing shanghai email login status active "
+         "premium order cart checkout payment shipped delivered review rating "
+         "preference notification language timezone device mobile desktop").split()
+
+
+def available_compressors():
+    """Compressor settings usable with the installed packages"""
+    settings = [
+        ("none", {}),
+        ("zlib-1", {"compressors": "zlib", "zlibCompressionLevel": 1}),
+        ("zlib-6", {"compressors": "zlib", "zlibCompressionLevel": 6}),
+        ("zlib-9", {"compressors": "zlib", "zlibCompressionLevel": 9}),
+    ]
+    if importlib.util.find_spec("snappy"):
+        settings.append(("snappy", {"compressors": "snappy"}))
+    if importlib.util.find_spec("zstandard"):
+        settings.append(("zstd", {"compressors": "zstd"}))
+    return settings
+
+
+def make_payload(kind, size, rng):
+    """Compressible: JSON-like profile text; incompressible: random bytes"""
+    if kind == "compressible":
+        fields = {}
+        used = 0
+        i = 0
+        while used < size:
+            value = " ".join(rng.choice(WORDS) for _ in range(8))
+            fields[f"field_{i}"] = value
+            used += len(value) + 10
+            i += 1
+        return fields
+    return {"blob": Binary(os.urandom(size))}
+
+
+class CompressionExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        # uncompressed client used only for setup and serverStatus counters
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+        self.test_collection = self.db['compression_test']
+
+    def _network_bytes(self):
+        """(physical, logical) bytes in and out: physical is what crossed the wire, logical is uncompressed"""
+        network = self.client.admin.command("serverStatus")["network"]
+        return ((network["physicalBytesIn"], network["bytesIn"]),
+                (network["physicalBytesOut"], network["bytesOut"]))
+
+    def _write_phase(self, client, w_value, payload_kind, size, num_docs, rng):
+        collection = client['lab2_distributed_db'].get_collection(
+            'compression_test',
+            write_concern=WriteConcern(w=w_value, j=True, wtimeout=5000)
+        )
+        # build payloads up front so only encoding/compression is timed
+        docs = [
+            {
+                "test_id": f"compression_{w_value}_{i}",
+                "timestamp": datetime.now(),
+                **make_payload(payload_kind, size, rng)
+            }
+            for i in range(num_docs)
+        ]
+        histogram = LatencyHistogram()
+        bytes_in_before, _ = self._network_bytes()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        for doc in docs:
+            op_start = time.perf_counter()
+            collection.insert_one(doc)
+            histogram.record((time.perf_counter() - op_start) * 1000)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        bytes_in_after, _ = self._network_bytes()
+        wire = tuple(after - before for after, before in zip(bytes_in_after, bytes_in_before))
+        return histogram, num_docs / elapsed, wire, cpu
+
+    def _read_phase(self, client, num_docs):
+        collection = client['lab2_distributed_db']['compression_test']
+        ids = [doc["_id"] for doc in self.test_collection.find({}, {"_id": 1})]
+        histogram = LatencyHistogram()
+        _, bytes_out_before = self._network_bytes()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        for _id in ids[:num_docs]:
+            op_start = time.perf_counter()
+            collection.find_one({"_id": _id})
+            histogram.record((time.perf_counter() - op_start) * 1000)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        _, bytes_out_after = self._network_bytes()
+        wire = tuple(after - before for after, before in zip(bytes_out_after, bytes_out_before))
+        return histogram, len(ids[:num_docs]) / elapsed, wire, cpu
+
+    def compression_benchmark(self, sizes=(1024, 16 * 1024, 256 * 1024), num_docs=50,
+                              payload_kinds=("compressible", "incompressible")):
+        """
+        For every compressor setting, payload kind and document size run the
+        w=1 / w='majority' / w=3 inserts and primary point reads.
+        Bytes on the wire are the primary's serverStatus
+        network.physicalBytesIn (writes) / physicalBytesOut (reads) deltas;
+        the logical bytesIn/bytesOut deltas give the compression ratio. Both
+        include a little replication and monitoring traffic.
+        """
+        print("\n" + "-"*70)
+        print("Wire Compression Benchmark")
+        print("-"*70)
+
+        settings = available_compressors()
+        print(f"Available compressors: {', '.join(name for name, _ in settings)}")
+        if not any(name == "snappy" for name, _ in settings):
+            print("   (install python-snappy to include snappy)")
+        if not any(name == "zstd" for name, _ in settings):
+            print("   (install zstandard to include zstd)")
+
+        write_concerns = [1, "majority", 3]
+
+        for payload_kind in payload_kinds:
+            for size in sizes:
+                print(f"\n{'─'*70}")
+                print(f"Payload: {payload_kind}, ~{size // 1024} KB per document, {num_docs} documents")
+                print(f"{'─'*70}")
+                print(f"  {'compressor':10} {'phase':12} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+                      f"{'wire KB':>9} {'ratio':>6} {'CPU ms':>8}")
+
+                for name, options in settings:
+                    client = MongoClient(self.connection_string, **options)
+                    try:
+                        for w_value in write_concerns:
+                            self.fixtures.reset('compression_test')
+                            self.fixtures.settle()
+                            rng = random.Random(size)
+                            histogram, throughput, wire, cpu = self._write_phase(
+                                client, w_value, payload_kind, size, num_docs, rng)
+                            latency = histogram.summary()
+                            print(f"  {name:10} {'write w=' + str(w_value):12} {throughput:>8.1f} "
+                                  f"{latency['p50']:>8.2f} {latency['p99']:>8.2f} "
+                                  f"{wire[0] / 1024:>9.1f} {wire[1] / max(wire[0], 1):>6.2f} {cpu * 1000:>8.1f}")
+
+                        histogram, throughput, wire, cpu = self._read_phase(client, num_docs)
+                        latency = histogram.summary()
+                        print(f"  {name:10} {'read':12} {throughput:>8.1f} "
+                              f"{latency['p50']:>8.2f} {latency['p99']:>8.2f} "
+                              f"{wire[0] / 1024:>9.1f} {wire[1] / max(wire[0], 1):>6.2f} {cpu * 1000:>8.1f}")
+                    except Exception as e:
+                        print(f"  {name:10} ❌ Failed: {e}")
+                    finally:
+                        client.close()
+
+        print(f"\n Notes:")
+        print(f"   wire KB = physical bytes seen by the primary (compressed size)")
+        print(f"   ratio   = logical (uncompressed) bytes / physical bytes")
+        print(f"   CPU ms  = client process CPU time, includes compression/decompression")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Wire Compression Benchmark")
+    print("="*70)
+
+    experiments = CompressionExperiments()
+
+    try:
+        experiments.compression_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,86 @@ Demonstrates Strong Consistency vs Eventual Consistency
 from pymongo import MongoClient, WriteConcern, ReadPreference
 from pymongo.read_concern import ReadConcern
 from pymongo.errors import ServerSelectionTimeoutError
+import multiprocessing
+import queue
+import random
 import time
 import os
 from datetime import datetime
 
+from causal_checker import check_member, format_op_key
+from cluster import find_secondaries
+from fixtures import Fixtures
+from hlc import HybridLogicalClock
+from raw_reads import raw_collection, timed_find_one
+
+
+def _causal_writer(writer_id, num_writers, connection_string, db_name, num_ops, dependency_ratio,
+                   max_skew_ms, barrier, results):
+    """
+    Writer process for experiment 4. Operation keys are writer << 32 | seq.
+    Each operation depends on the writer's previous one and, with probability
+    dependency_ratio, on the latest operation of another writer read just
+    before it (its HLC is merged into this writer's clock first)
+    """
+    client = MongoClient(connection_string)
+    try:
+        rng = random.Random(writer_id)
+        clock = HybridLogicalClock(skew_ms=rng.uniform(-max_skew_ms, max_skew_ms))
+        collection = client[db_name].get_collection(
+            'causal_consistency_test', write_concern=WriteConcern(w=1))
+        others = [w for w in range(num_writers) if w != writer_id]
+        cross_edges = 0
+        wall_clock_inversions = 0
+        with client.start_session(causal_consistency=True) as session:
+            barrier.wait()
+            previous = None
+            previous_wall_ms = None
+            for seq in range(num_ops):
+                depends_on = [previous] if previous is not None else []
+                dependency_wall_ms = [previous_wall_ms] if previous is not None else []
+                if others and rng.random() < dependency_ratio:
+                    other = collection.find_one({"writer": rng.choice(others)}, {"op_key": 1, "hlc": 1, "wall_ms": 1},
+                                                sort=[("seq", -1)], session=session)
+                    clock.observe_session(session)
+                    if other:
+                        clock.receive(other["hlc"])
+                        depends_on.append(other["op_key"])
+                        dependency_wall_ms.append(other["wall_ms"])
+                        cross_edges += 1
+                op_key = writer_id << 32 | seq
+                wall_ms = clock.wall_ms()
+                # a dependency with a later wall-clock timestamp would sort after this operation
+                wall_clock_inversions += sum(1 for t in dependency_wall_ms if t > wall_ms)
+                collection.insert_one({
+                    "op_key": op_key,
+                    "writer": writer_id,
+                    "seq": seq,
+                    "hlc": clock.now(),
+                    "wall_ms": wall_ms,
+                    "depends_on": depends_on
+                }, session=session)
+                clock.observe_session(session)
+                previous, previous_wall_ms = op_key, wall_ms
+        results.put({"writer": writer_id, "ops": num_ops, "cross_edges": cross_edges,
+                     "wall_clock_inversions": wall_clock_inversions, "skew_ms": clock.skew_ms})
+    except Exception as e:
+        results.put({"writer": writer_id, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        client.close()
+
+
 class ConsistencyExperiments:
-    def __init__(self):
+    def __init__(self, raw_reads=False, db_name='lab2_distributed_db'):
+        """raw_reads=True reads RawBSONDocument and reports decode time separately"""
+        self.raw_reads = raw_reads
         self.connection_string = os.getenv(
             'MONGO_URI',
             'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
         )
         self.client = MongoClient(self.connection_string)
-        self.db = self.client['lab2_distributed_db']
+        self.db = self.client[db_name]
+        self.fixtures = Fixtures(self.db)
         
     def experiment_1_strong_consistency(self):
         """
@@ -67,12 +135,14 @@ class ConsistencyExperiments:
         print("─"*70)
         
         # Read from Secondary (with majority read concern)
-        start_read = time.time()
-        found_doc = collection.find_one({"test_id": "strong_consistency_test"})
-        read_time = (time.time() - start_read) * 1000
+        found_doc, read_time, decode_time = timed_find_one(
+            collection, {"test_id": "strong_consistency_test"}, raw=self.raw_reads
+        )
         
         if found_doc:
             print(f"✅ Successfully read data, time: {read_time:.2f} ms")
+            if decode_time is not None:
+                print(f"   Client-side decode: {decode_time:.3f} ms (not included above)")
             print(f"   Read value: {found_doc['value']}")
             print(f"   Message: {found_doc['message']}")
         else:
@@ -95,7 +165,7 @@ class ConsistencyExperiments:
         print(f"   New value: {new_value}")
         
         # Immediate read verification
-        found_doc = collection.find_one({"test_id": "strong_consistency_test"})
+        found_doc = self._reads(collection).find_one({"test_id": "strong_consistency_test"})
         print(f"   Immediately read value: {found_doc['value']}")
         
         if found_doc['value'] == new_value:
@@ -107,6 +177,8 @@ class ConsistencyExperiments:
         print(f"\n Performance Analysis:")
         print(f"   Write latency: {write_time:.2f} ms")
         print(f"   Read latency: {read_time:.2f} ms")
+        if decode_time is not None:
+            print(f"   Read decode time: {decode_time:.3f} ms (raw BSON mode)")
         print(f"   Update latency: {update_time:.2f} ms")
         
         print(f"\n CAP Theorem Analysis:")
@@ -141,10 +213,10 @@ class ConsistencyExperiments:
             write_concern=WriteConcern(w=1)  # Only write to Primary
         )
         
-        read_collection = self.db.get_collection(
+        read_collection = self._reads(self.db.get_collection(
             'consistency_test',
             read_preference=ReadPreference.SECONDARY_PREFERRED  # Prefer reading from Secondary
-        )
+        ))
         
         print("Step 1: Write data with eventual consistency configuration")
         print("─"*70)
@@ -170,10 +242,14 @@ class ConsistencyExperiments:
         print("─"*70)
         
         # Try to read immediately (may not find or read stale data)
-        found_doc = read_collection.find_one({"test_id": "eventual_consistency_test"})
+        found_doc, read_time, decode_time = timed_find_one(
+            read_collection, {"test_id": "eventual_consistency_test"}, raw=self.raw_reads
+        )
         
         if found_doc:
-            print(f"✅ Read data: counter = {found_doc['counter']}")
+            print(f"✅ Read data: counter = {found_doc['counter']}, time: {read_time:.2f} ms")
+            if decode_time is not None:
+                print(f"   Client-side decode: {decode_time:.3f} ms (not included above)")
             print(f"    Data may have already replicated to Secondary")
         else:
             print(f"⚠️  Data not found yet (normal phenomenon)")
@@ -247,6 +323,9 @@ class ConsistencyExperiments:
         # Performance comparison
         print(f"\n Performance Analysis:")
         print(f"   Write latency: {write_time:.2f} ms")
+        print(f"   Read latency: {read_time:.2f} ms")
+        if decode_time is not None:
+            print(f"   Read decode time: {decode_time:.3f} ms (raw BSON mode)")
         print(f"   Average update latency: {avg_update_time:.2f} ms")
         
         print(f"\n CAP Theorem Analysis:")
@@ -287,9 +366,10 @@ class ConsistencyExperiments:
             write_concern=WriteConcern(w=1)
         )
         
-        # Clear test collections
-        strong_collection.delete_many({})
-        eventual_collection.delete_many({})
+        # Fresh test collections, old data dropped outside the measurement
+        self.fixtures.reset('comparison_test_strong')
+        self.fixtures.reset('comparison_test_eventual')
+        self.fixtures.settle()
         
         num_operations = 50
         
@@ -331,13 +411,18 @@ class ConsistencyExperiments:
         print(f"   {'Eventual consistency faster' if speedup > 0 else 'Strong consistency faster'} {'⚡' if speedup > 30 else ''}")
 
     
-    def experiment_4_causal_consistency(self):
+    def experiment_4_causal_consistency(self, num_writers=4, ops_per_writer=2000,
+                                        dependency_ratio=0.3, max_skew_ms=50, writer_timeout=300):
         """
         Experiment 4: Causal Consistency - Optional/Bonus Experiment
         
         Causal consistency guarantee: If operation A causally affects operation B, 
         all nodes will observe A and B in the same order
-        In MongoDB, we can simulate causal consistency through timestamps and operation order
+        Several writer processes with skewed wall clocks build a dependency graph:
+        each operation depends on the writer's previous operation and, sometimes,
+        on the latest operation of another writer that it has just read. Every
+        operation is stamped with a hybrid logical clock (hlc.py) and lists its
+        dependencies explicitly. The writers get `writer_timeout` seconds in total
         """
         print("\n" + "="*70)
         print(" Experiment 4: Causal Consistency")
@@ -350,125 +435,100 @@ class ConsistencyExperiments:
             write_concern=WriteConcern(w=1)  # Use eventual consistency configuration
         )
         
-        print("Step 1: Create causally related operation sequence")
-        print("─"*70)
-        
-        # Clear test data
-        causal_collection.delete_many({})
-        
-        # Simulate causally related operations
-        operations = []
-        base_time = datetime.now()
-        
-        # Operation 1: User login
-        login_time = base_time
-        operations.append({
-            "operation_id": "login_001",
-            "user_id": "user123",
-            "action": "login",
-            "timestamp": login_time,
-            "causal_order": 1
-        })
-        
-        # Operation 2: User views profile (causally depends on login)
-        profile_time = login_time.replace(microsecond=login_time.microsecond + 1000)
-        operations.append({
-            "operation_id": "profile_001", 
-            "user_id": "user123",
-            "action": "view_profile",
-            "timestamp": profile_time,
-            "causal_order": 2,
-            "depends_on": "login_001"
-        })
-        
-        # Operation 3: User updates status (causally depends on login)
-        status_time = login_time.replace(microsecond=login_time.microsecond + 2000)
-        operations.append({
-            "operation_id": "status_001",
-            "user_id": "user123", 
-            "action": "update_status",
-            "timestamp": status_time,
-            "causal_order": 3,
-            "depends_on": "login_001"
-        })
-        
-        # Operation 4: User views other user profile (concurrent with above operations, no causal relationship)
-        other_time = login_time.replace(microsecond=login_time.microsecond + 500)
-        operations.append({
-            "operation_id": "other_001",
-            "user_id": "user123",
-            "action": "view_other_profile", 
-            "timestamp": other_time,
-            "causal_order": 1.5,  # Concurrent operation
-            "depends_on": None
-        })
-        
-        print("✅ Created 4 operations, 3 have causal dependencies")
-        print("   Operation sequence:")
-        for op in operations:
-            dep_info = f" (depends on: {op['depends_on']})" if op.get('depends_on') else " (concurrent operation)"
-            print(f"   {op['causal_order']}. {op['action']} - {op['timestamp']}{dep_info}")
-        
-        print("\nStep 2: Execute operations in timestamp order")
+        print("Step 1: Generate a multi-writer dependency graph")
         print("─"*70)
         
-        # Execute in timestamp order
-        sorted_ops = sorted(operations, key=lambda x: x['timestamp'])
-        
-        for i, op in enumerate(sorted_ops, 1):
-            print(f"   Execute operation {i}: {op['action']}")
-            causal_collection.insert_one(op)
-            time.sleep(0.1)  # Simulate network delay
+        # Fresh test collection (indexes + validator from fixtures.SPECS)
+        self.fixtures.reset('causal_consistency_test')
+        self.fixtures.settle()
+        
+        context = multiprocessing.get_context("spawn")  # MongoClient is not fork-safe
+        barrier = context.Barrier(num_writers)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=_causal_writer,
+                args=(w, num_writers, self.connection_string, self.db.name, ops_per_writer,
+                      dependency_ratio, max_skew_ms, barrier, results)
+            )
+            for w in range(num_writers)
+        ]
+        for p in processes:
+            p.start()
         
-        print("\nStep 3: Verify causal consistency")
+        writers = []
+        deadline = time.monotonic() + writer_timeout
+        try:
+            for _ in processes:
+                try:
+                    result = results.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    barrier.abort()
+                    print(f"   ⚠️  Writers did not finish within {writer_timeout}s")
+                    break
+                if "error" in result:
+                    barrier.abort()
+                    print(f"   ⚠️  Writer {result['writer']} failed: {result['error']}")
+                    continue
+                writers.append(result)
+        finally:
+            for p in processes:
+                p.join(timeout=10)
+                if p.is_alive():
+                    p.terminate()
+        
+        for result in sorted(writers, key=lambda r: r["writer"]):
+            print(f"   Writer {result['writer']}: {result['ops']} operations, "
+                  f"{result['cross_edges']} cross-writer dependencies, "
+                  f"clock skew {result['skew_ms']:+.1f}ms")
+        
+        print("\nStep 2: Verify dependency order on every secondary")
         print("─"*70)
         
-        # Read data from different node
-        read_collection = self.db.get_collection(
-            'causal_consistency_test',
-            read_preference=ReadPreference.SECONDARY_PREFERRED
-        )
-        
-        print(" Waiting for data replication...")
-        time.sleep(0.1)  # Very short wait since local Docker environment replicates extremely quickly
+        # The writes were w=1: wait until every secondary has applied them,
+        # otherwise unreplicated operations would be reported as missing
+        if not self.fixtures.settle():
+            print("   ⚠️  Secondaries did not catch up, missing operations may be replication lag")
         
-        # Read all operations
-        all_operations = list(read_collection.find().sort("timestamp", 1))
-        
-        print("✅ Operation sequence read from Secondary node:")
-        for i, op in enumerate(all_operations, 1):
-            print(f"   {i}. {op['action']} - {op['timestamp']} (causal order: {op['causal_order']})")
-        
-        # Verify causal consistency
-        print("\nStep 4: Causal consistency verification")
-        print("─"*70)
-        
-        # Check if causal dependencies are correctly maintained
+        # Each secondary is checked in its own apply order against a per-writer position index
         causal_violations = []
         
-        for op in all_operations:
-            if op.get('depends_on'):
-                # Find dependent operation
-                dependent_op = next((o for o in all_operations if o['operation_id'] == op['depends_on']), None)
-                if dependent_op:
-                    if op['timestamp'] < dependent_op['timestamp']:
-                        causal_violations.append(f"{op['action']} executed before {dependent_op['action']}")
+        def report(op_key, dependency, position, dependency_position):
+            if len(causal_violations) < 10:
+                if dependency_position is None:
+                    print(f"   ⚠️  {format_op_key(op_key)} (position {position}) "
+                          f"depends on {format_op_key(dependency)}, which is missing")
+                else:
+                    print(f"   ⚠️  {format_op_key(op_key)} (position {position}) "
+                          f"applied before {format_op_key(dependency)} (position {dependency_position})")
+            causal_violations.append((op_key, dependency))
+        
+        for member in find_secondaries(self.client):
+            result = check_member(member, self.db.name, 'causal_consistency_test',
+                                  on_violation=report, raw=self.raw_reads)
+            print(f"   {member}: {result['operations']} operations, {result['edges']} dependency edges, "
+                  f"{result['out_of_order']} out of order, {result['missing']} missing")
+            if result['decode_ms'] is not None:
+                print(f"      scan {result['scan_ms']:.1f} ms, of which client-side decode "
+                      f"{result['decode_ms']:.1f} ms (raw BSON mode)")
+        
+        wall_clock_inversions = sum(r["wall_clock_inversions"] for r in writers)
+        print(f"   Edges that skewed wall clocks would order wrongly: {wall_clock_inversions}")
         
         if not causal_violations:
             print("✅ Causal consistency verification passed!")
-            print("   • All causally related operations executed in correct order")
+            print("   • Every secondary applied each operation after all of its dependencies")
             print("   • Concurrent operations can execute in any order")
             print("   • This guarantees system logical correctness")
         else:
-            print(" Causal consistency violations found:")
-            for violation in causal_violations:
-                print(f"   • {violation}")
+            print(f" Causal consistency violations found: {len(causal_violations)}")
         
         print(f"\n Causal Consistency Analysis:")
         print(f"   ✅ Guarantees causally related operations execute in correct order")
         print(f"   ✅ Allows concurrent operations to execute in any order")
         print(f"   ✅ More flexible than strong consistency, stricter than eventual consistency")
         print(f"    Suitable for scenarios requiring logical operation order")
+        print(f"    Wall clocks alone misorder causally related writes once writers are skewed")
         
         print(f"\n Use Cases:")
         print(f"   ✓ Social media timelines (posts in chronological order)")
@@ -476,9 +536,14 @@ class ConsistencyExperiments:
         print(f"   ✓ Game state updates")
         print(f"   ✓ Collaborative editing systems")
     
+    def _reads(self, collection):
+        """Collection used for reads: RawBSONDocument results in raw_reads mode"""
+        return raw_collection(collection) if self.raw_reads else collection
+    
     def close(self):
         """Close connection"""
         if self.client:
+            self.fixtures.close()
             self.client.close()
 
 
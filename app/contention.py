@@ -0,0 +1,210 @@
+"""
+Part D: Hot-document Contention Workload
+N writers increment counters on one hot document or a Zipf-distributed key
+set, comparing update operators under each write concern
+"""
+
+from pymongo import MongoClient, WriteConcern, ReturnDocument
+from pymongo.errors import OperationFailure
+import bisect
+import itertools
+import os
+import random
+import threading
+import time
+import traceback
+
+from fixtures import Fixtures
+from load_generator import LatencyHistogram
+
+WRITE_CONFLICT = 112
+
+
+class ZipfKeys:
+    """Samples key indexes 0..n-1 with probability proportional to 1/(k+1)^s"""
+
+    def __init__(self, n, s=1.1, seed=None):
+        weights = [1.0 / (k + 1) ** s for k in range(n)]
+        self.cumulative = list(itertools.accumulate(weights))
+        self.random = random.Random(seed)
+
+    def sample(self):
+        return bisect.bisect_left(self.cumulative, self.random.random() * self.cumulative[-1])
+
+
+class ContentionExperiments:
+    OPERATORS = ["$set", "$inc", "find_one_and_update", "cas"]
+
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string, maxPoolSize=200)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+        self.test_collection = self.db['contention_test']
+
+    def _reset_counters(self, num_keys):
+        self.fixtures.reset('contention_test')
+        self.test_collection.insert_many(
+            [{"_id": k, "counter": 0, "version": 0} for k in range(num_keys)]
+        )
+        self.fixtures.settle()
+
+    def _server_write_conflicts(self):
+        status = self.client.admin.command("serverStatus")
+        return status.get("metrics", {}).get("operation", {}).get("writeConflicts", 0)
+
+    def _increment(self, collection, operator, key, counters):
+        """One logical increment of `key`; returns once it has been applied"""
+        while True:
+            try:
+                if operator == "$set":
+                    # read-modify-write without a guard: concurrent writers lose updates
+                    doc = collection.find_one({"_id": key}, {"counter": 1})
+                    collection.update_one({"_id": key}, {"$set": {"counter": doc["counter"] + 1}})
+                elif operator == "$inc":
+                    collection.update_one({"_id": key}, {"$inc": {"counter": 1}})
+                elif operator == "find_one_and_update":
+                    collection.find_one_and_update(
+                        {"_id": key},
+                        {"$inc": {"counter": 1}},
+                        return_document=ReturnDocument.AFTER
+                    )
+                else:
+                    # compare-and-set on a version field, retried on mismatch
+                    doc = collection.find_one({"_id": key}, {"counter": 1, "version": 1})
+                    result = collection.update_one(
+                        {"_id": key, "version": doc["version"]},
+                        {"$set": {"counter": doc["counter"] + 1}, "$inc": {"version": 1}}
+                    )
+                    if result.matched_count == 0:
+                        counters["cas_retries"] += 1
+                        continue
+                return
+            except OperationFailure as e:
+                if e.code != WRITE_CONFLICT:
+                    raise
+                counters["write_conflicts"] += 1
+
+    def _run(self, collection, operator, writers, key_mode, num_keys, duration, zipf_s):
+        histogram = LatencyHistogram()
+        totals = {"ops": 0, "errors": 0, "cas_retries": 0, "write_conflicts": 0}
+        lock = threading.Lock()
+
+        def writer(writer_id, deadline):
+            keys = ZipfKeys(num_keys, zipf_s, seed=writer_id) if key_mode == "zipf" else None
+            local = LatencyHistogram()
+            counters = {"ops": 0, "errors": 0, "cas_retries": 0, "write_conflicts": 0}
+            while time.perf_counter() < deadline:
+                key = keys.sample() if keys else 0
+                start = time.perf_counter()
+                try:
+                    self._increment(collection, operator, key, counters)
+                    local.record((time.perf_counter() - start) * 1000)
+                    counters["ops"] += 1
+                except Exception:
+                    counters["errors"] += 1
+            with lock:
+                histogram.merge(local)
+                for name in totals:
+                    totals[name] += counters[name]
+
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=writer, args=(w, deadline)) for w in range(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        totals["latency"] = histogram.summary()
+        return totals
+
+    def contention_sweep(self, writer_counts=(1, 4, 16, 64), key_modes=("hot", "zipf"),
+                         num_keys=1000, zipf_s=1.1, duration=3):
+        """
+        For every write concern, key distribution and update operator, raise
+        the number of concurrent writers and report throughput, retries and
+        tail latency. `lost` counts increments that were acknowledged but are
+        missing from the final counters (expected only for the unguarded $set).
+        """
+        print("\n" + "-"*70)
+        print("Hot-document Contention Workload")
+        print("-"*70)
+        print(f"Writers: {list(writer_counts)}, keys: hot=1 / zipf={num_keys} (s={zipf_s}), "
+              f"duration: {duration}s per run")
+
+        write_concerns = [
+            (1, "w=1: Only Primary confirmed"),
+            ("majority", "w='majority': Majority nodes confirmed"),
+            (3, "w=3: All nodes confirmed")
+        ]
+
+        for w_value, description in write_concerns:
+            collection = self.db.get_collection(
+                'contention_test',
+                write_concern=WriteConcern(w=w_value, wtimeout=5000)
+            )
+            for key_mode in key_modes:
+                keys = 1 if key_mode == "hot" else num_keys
+                print(f"\n{'─'*70}")
+                print(f"Test Configuration: {description}, keys: {key_mode}")
+                print(f"{'─'*70}")
+                print(f"  {'operator':20} {'writers':>7} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+                      f"{'retries':>8} {'WC srv':>7} {'lost':>6} {'extra':>6}")
+
+                for operator in self.OPERATORS:
+                    for writers in writer_counts:
+                        self._reset_counters(keys)
+                        conflicts_before = self._server_write_conflicts()
+                        result = self._run(collection, operator, writers, key_mode,
+                                           keys, duration, zipf_s)
+                        server_conflicts = self._server_write_conflicts() - conflicts_before
+
+                        final = next(self.test_collection.aggregate([
+                            {"$group": {"_id": None, "total": {"$sum": "$counter"}}}
+                        ]), {"total": 0})["total"]
+                        lost = max(0, result["ops"] - final)
+                        extra = max(0, final - result["ops"])
+                        retries = result["cas_retries"] + result["write_conflicts"]
+                        latency = result["latency"]
+                        print(f"  {operator:20} {writers:>7} {result['ops'] / duration:>9.1f} "
+                              f"{latency['p50']:>8.2f} {latency['p99']:>8.2f} {retries:>8} "
+                              f"{server_conflicts:>7} {lost:>6} {extra:>6}")
+                        if result["errors"]:
+                            print(f"  {'':20} ❌ {result['errors']} operations failed")
+
+        print(f"\n Notes:")
+        print(f"   retries = client-side CAS mismatches + WriteConflict errors")
+        print(f"   WC srv  = server-side writeConflicts retried internally (serverStatus)")
+        print(f"   lost    = acknowledged increments missing from the final counters")
+        print(f"   extra   = increments applied beyond the acknowledged ones (failed or retried ops that landed)")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Hot-document Contention Workload")
+    print("="*70)
+
+    experiments = ContentionExperiments()
+
+    try:
+        experiments.contention_sweep()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
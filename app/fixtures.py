@@ -0,0 +1,114 @@
+"""
+Experiment Fixtures
+Resets experiment collections without delete_many({}): the old collection is
+renamed aside (a single oplog entry), a fresh one is created under the same
+name with its indexes and validator, and the old namespace is dropped in the
+background with w='majority'. settle() waits for those drops and for every
+secondary to catch up before the next timed phase.
+"""
+
+from pymongo import WriteConcern
+from collections import namedtuple
+from datetime import datetime
+import itertools
+import threading
+import time
+
+from cluster import get_members
+
+# indexes: list of (keys, options) passed to create_index
+CollectionSpec = namedtuple('CollectionSpec', 'indexes validator')
+
+SPECS = {
+    'user_profiles': CollectionSpec(
+        indexes=[("user_id", {"unique": True}), ("username", {})],
+        validator={"$jsonSchema": {
+            "bsonType": "object",
+            "required": ["user_id", "username", "email"],
+            "properties": {
+                "user_id": {"bsonType": ["int", "long"]},
+                "username": {"bsonType": "string"},
+                "email": {"bsonType": "string"},
+            },
+        }},
+    ),
+    'replication_test': CollectionSpec(indexes=[("test_id", {})], validator=None),
+    'comparison_test_strong': CollectionSpec(indexes=[("index", {})], validator=None),
+    'comparison_test_eventual': CollectionSpec(indexes=[("index", {})], validator=None),
+    'open_loop_test': CollectionSpec(indexes=[("seq", {})], validator=None),
+    'multiprocess_test': CollectionSpec(indexes=[("seq", {})], validator=None),
+    'chaos_test': CollectionSpec(indexes=[("worker", {})], validator=None),
+    'causal_consistency_test': CollectionSpec(
+        indexes=[([("writer", 1), ("seq", -1)], {}), ("hlc", {}), ("op_key", {"unique": True})],
+        validator={"$jsonSchema": {
+            "bsonType": "object",
+            "required": ["op_key", "writer", "seq", "hlc", "depends_on"],
+            "properties": {
+                "op_key": {"bsonType": ["int", "long"]},
+                "hlc": {"bsonType": ["int", "long"]},
+                "depends_on": {"bsonType": "array", "items": {"bsonType": ["int", "long"]}},
+            },
+        }},
+    ),
+}
+
+RETIRED_MARKER = "__retired_"
+
+
+class Fixtures:
+    def __init__(self, db):
+        self.db = db
+        self.admin = db.client.admin
+        self.majority = WriteConcern(w="majority", wtimeout=60000)
+        self.sequence = itertools.count()
+        self.pending = []
+        self.drop_retired()
+
+    def reset(self, name, spec=None):
+        """Give `name` a fresh, empty collection; the old data is dropped asynchronously"""
+        spec = spec or SPECS.get(name, CollectionSpec(indexes=[], validator=None))
+        if name in self.db.list_collection_names(filter={"name": name}):
+            retired = f"{name}{RETIRED_MARKER}{datetime.now():%H%M%S}_{next(self.sequence)}"
+            self.admin.command('renameCollection', f"{self.db.name}.{name}",
+                               to=f"{self.db.name}.{retired}", writeConcern=self.majority.document)
+            self._drop_async(retired)
+
+        options = {"validator": spec.validator} if spec.validator else {}
+        collection = self.db.create_collection(name, write_concern=self.majority, **options)
+        for keys, index_options in spec.indexes:
+            collection.create_index(keys, **index_options)
+        return self.db[name]
+
+    def _drop_async(self, name):
+        collection = self.db.get_collection(name, write_concern=self.majority)
+        thread = threading.Thread(target=collection.drop, daemon=True)
+        thread.start()
+        self.pending.append(thread)
+
+    def drop_retired(self):
+        """Drop namespaces left behind by earlier runs that did not settle"""
+        for name in self.db.list_collection_names():
+            if RETIRED_MARKER in name:
+                self._drop_async(name)
+
+    def settle(self, timeout=60):
+        """Wait for pending drops and until every secondary has applied everything so far"""
+        deadline = time.monotonic() + timeout
+        for thread in self.pending:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.pending = [t for t in self.pending if t.is_alive()]
+
+        members = get_members(self.db.client)
+        primary = next((m for m in members if m['stateStr'] == 'PRIMARY'), None)
+        if primary is None:
+            return False
+        target = primary['optime']['ts']
+        while time.monotonic() < deadline:
+            members = get_members(self.db.client)
+            if all(m['optime']['ts'] >= target for m in members if m['stateStr'] == 'SECONDARY'):
+                return not self.pending
+            time.sleep(0.05)
+        return False
+
+    def close(self, timeout=60):
+        self.settle(timeout)
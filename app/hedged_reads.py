@@ -0,0 +1,232 @@
+"""
+Part D: Hedged Secondary Reads
+Sends a read to one secondary and, if it has not answered within a hedge
+delay (fixed, or the adaptive p95 of recent reads), sends a duplicate to
+another member through per-member direct clients and takes the first reply
+"""
+
+from pymongo import MongoClient, WriteConcern
+from pymongo.errors import OperationFailure
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os
+import random
+import threading
+import time
+import traceback
+
+from cluster import direct_client, find_primary, find_secondaries
+from load_generator import LatencyHistogram, percentile
+
+
+class HedgedReader:
+    """
+    find_one() against `hosts` (secondaries first). delay_ms=None hedges
+    after the adaptive `adaptive_percentile` of recent attempt latencies,
+    a number hedges after that fixed delay, hedge=False never hedges.
+    The losing attempt is not cancelled, so every hedge is extra load.
+    """
+
+    def __init__(self, hosts, db_name, collection_name, hedge=True, delay_ms=None,
+                 adaptive_percentile=95, window=500, min_delay_ms=1.0, max_workers=32, seed=None):
+        self.hosts = list(hosts)
+        self.hedge = hedge and len(self.hosts) > 1
+        self.delay_ms = delay_ms
+        self.adaptive_percentile = adaptive_percentile
+        self.min_delay_ms = min_delay_ms
+        self.clients = {host: direct_client(host) for host in self.hosts}
+        self.collections = {host: client[db_name][collection_name] for host, client in self.clients.items()}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.latencies = deque(maxlen=window)
+        self.random = random.Random(seed)
+        self.injection_random = random.Random(seed)  # separate stream: same slow reads for every reader
+        self.injection_lock = threading.Lock()
+        self.injected = {}  # host -> (probability, delay_ms): client-side slow member
+        self.stats = {"reads": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def name(self):
+        if not self.hedge:
+            return "single secondary"
+        if self.delay_ms is None:
+            return f"hedged (adaptive p{self.adaptive_percentile})"
+        return f"hedged ({self.delay_ms:g}ms)"
+
+    def current_delay_ms(self):
+        if self.delay_ms is not None:
+            return self.delay_ms
+        if len(self.latencies) < 20:
+            return 10.0  # until there are enough samples
+        return max(self.min_delay_ms, percentile(list(self.latencies), self.adaptive_percentile))
+
+    def _attempt(self, host, filter):
+        start = time.perf_counter()
+        probability, delay_ms = self.injected.get(host, (0.0, 0.0))
+        if probability:
+            with self.injection_lock:  # attempts run on pool threads
+                slow = self.injection_random.random() < probability
+            if slow:
+                time.sleep(delay_ms / 1000)
+        document = self.collections[host].find_one(filter)
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        return document
+
+    def find_one(self, filter):
+        self.stats["reads"] += 1
+        first, *others = self.random.sample(self.hosts, len(self.hosts))
+        futures = {self.pool.submit(self._attempt, first, filter)}
+        if not self.hedge:
+            return futures.pop().result()
+
+        done, _ = wait(futures, timeout=self.current_delay_ms() / 1000)
+        if done and next(iter(done)).exception() is None:
+            return next(iter(done)).result()
+        hedge = self.pool.submit(self._attempt, others[0], filter)
+        futures.add(hedge)
+        self.stats["hedges"] += 1
+
+        error = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.stats["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        for client in self.clients.values():
+            client.close()
+
+
+class HedgedReadExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.test_collection = self.db.get_collection(
+            'hedged_read_test', write_concern=WriteConcern(w=3, wtimeout=30000))
+
+    def _seed(self, num_docs):
+        self.test_collection.drop()
+        self.test_collection.insert_many([
+            {"_id": i, "username": f"user_{i}", "data": "x" * 200} for i in range(num_docs)
+        ])
+
+    def _slow_member(self, host, probability, delay_ms):
+        """Delay `probability` of finds on host: failCommand failpoint if test commands are enabled"""
+        member = direct_client(host)
+        try:
+            member.admin.command(
+                'configureFailPoint', 'failCommand',
+                mode={'activationProbability': probability},
+                data={'failCommands': ['find'], 'blockConnection': True, 'blockTimeMS': int(delay_ms)})
+            return "server failpoint"
+        except OperationFailure:
+            return None
+        finally:
+            member.close()
+
+    def _clear_slow_member(self, host):
+        member = direct_client(host)
+        try:
+            member.admin.command('configureFailPoint', 'failCommand', mode='off')
+        except OperationFailure:
+            pass
+        finally:
+            member.close()
+
+    def hedge_benchmark(self, num_docs=10000, num_reads=3000, fixed_delays_ms=(2, 5, 10),
+                        slow_probability=0.2, slow_delay_ms=50, include_primary=False):
+        """
+        Single-secondary reads vs hedged reads (fixed delays and adaptive p95),
+        on a healthy cluster and with one slow secondary
+        """
+        print("\n" + "-"*70)
+        print("Hedged Secondary Reads")
+        print("-"*70)
+
+        self._seed(num_docs)
+        hosts = find_secondaries(self.client)
+        if include_primary:
+            hosts.append(find_primary(self.client))
+        print(f"Members: {', '.join(hosts)}; reads per mode: {num_reads}")
+
+        scenarios = [("healthy", None), (f"slow {hosts[0]}", hosts[0])]
+        for scenario, slow_host in scenarios:
+            print(f"\n{'─'*70}")
+            injection = None
+            if slow_host:
+                injection = self._slow_member(slow_host, slow_probability, slow_delay_ms) or "client-side delay"
+                print(f"Scenario: {scenario} ({slow_probability:.0%} of its reads +{slow_delay_ms}ms, "
+                      f"via {injection})")
+            else:
+                print(f"Scenario: {scenario}")
+            print(f"{'─'*70}")
+            print(f"  {'mode':26} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'extra load':>11} {'hedge wins':>11}")
+
+            baseline_p99 = None
+            readers = [HedgedReader(hosts, self.db.name, self.test_collection.name, hedge=False, seed=1)]
+            readers += [HedgedReader(hosts, self.db.name, self.test_collection.name, delay_ms=d, seed=1)
+                        for d in fixed_delays_ms]
+            readers.append(HedgedReader(hosts, self.db.name, self.test_collection.name, seed=1))
+            try:
+                for reader in readers:
+                    if injection == "client-side delay":
+                        reader.injected[slow_host] = (slow_probability, slow_delay_ms)
+                    rng = random.Random(3)
+                    histogram = LatencyHistogram()
+                    for _ in range(num_reads):
+                        start = time.perf_counter()
+                        reader.find_one({"_id": rng.randrange(num_docs)})
+                        histogram.record((time.perf_counter() - start) * 1000)
+                    p99 = histogram.percentile(99)
+                    baseline_p99 = baseline_p99 or p99
+                    stats = reader.stats
+                    extra = stats["hedges"] / stats["reads"]
+                    wins = stats["hedge_wins"] / stats["hedges"] if stats["hedges"] else 0.0
+                    gain = f" (p99 {p99 / baseline_p99 - 1:+.0%})" if reader.hedge else ""
+                    print(f"  {reader.name:26} {histogram.percentile(50):>8.2f} {p99:>8.2f} "
+                          f"{histogram.percentile(99.9):>9.2f} {extra:>11.1%} {wins:>11.1%}{gain}")
+            finally:
+                for reader in readers:
+                    reader.close()
+                if injection == "server failpoint":
+                    self._clear_slow_member(slow_host)
+
+        print(f"\n Notes:")
+        print(f"   extra load = duplicate reads sent per read (losing attempts are not cancelled)")
+        print(f"   (p99 ±x%) = p99 change against single-secondary reads in the same scenario")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Hedged Secondary Reads")
+    print("="*70)
+
+    experiments = HedgedReadExperiments()
+
+    try:
+        experiments.hedge_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Hybrid Logical Clock
+HLC timestamps (physical ms + logical counter) for stamping causally related
+operations across writers whose wall clocks may be skewed. The clock also
+advances from the clusterTime / operationTime MongoDB returns with every
+response, so a writer never stamps below a cluster time it has observed.
+"""
+
+import threading
+import time
+
+LOGICAL_BITS = 20  # ~1M stamps per ms; leaves room for ms timestamps in an int64
+MAX_LOGICAL = (1 << LOGICAL_BITS) - 1
+
+
+def encode(physical_ms, logical):
+    """Pack into one int that orders like (physical_ms, logical); fits a BSON int64"""
+    return (physical_ms << LOGICAL_BITS) | logical
+
+
+def decode(stamp):
+    """Inverse of encode: (physical_ms, logical)"""
+    return stamp >> LOGICAL_BITS, stamp & MAX_LOGICAL
+
+
+def from_bson_timestamp(timestamp):
+    """MongoDB Timestamp(seconds, increment) as an HLC stamp"""
+    return encode(timestamp.time * 1000, min(timestamp.inc, MAX_LOGICAL))
+
+
+class HybridLogicalClock:
+    """
+    Kulkarni et al. hybrid logical clock.
+
+    now() is a local or send event, receive(stamp) merges a stamp seen in a
+    message (a document written by another writer, a cluster time). Stamps
+    are strictly increasing per clock and always larger than every received
+    stamp. skew_ms shifts this clock's wall time to simulate skewed writers.
+    """
+
+    def __init__(self, skew_ms=0.0):
+        self.skew_ms = skew_ms
+        self.lock = threading.Lock()
+        self.physical = 0
+        self.logical = 0
+
+    def wall_ms(self):
+        return int(time.time() * 1000 + self.skew_ms)
+
+    def _advance(self, physical, logical):
+        if logical > MAX_LOGICAL:
+            # counter exhausted within one ms: borrow the next millisecond
+            physical, logical = physical + 1, 0
+        self.physical, self.logical = physical, logical
+        return encode(physical, logical)
+
+    def now(self):
+        with self.lock:
+            wall = self.wall_ms()
+            if wall > self.physical:
+                return self._advance(wall, 0)
+            return self._advance(self.physical, self.logical + 1)
+
+    def receive(self, stamp):
+        remote_physical, remote_logical = decode(stamp)
+        with self.lock:
+            wall = self.wall_ms()
+            physical = max(self.physical, remote_physical, wall)
+            if physical == self.physical == remote_physical:
+                logical = max(self.logical, remote_logical) + 1
+            elif physical == self.physical:
+                logical = self.logical + 1
+            elif physical == remote_physical:
+                logical = remote_logical + 1
+            else:
+                logical = 0
+            return self._advance(physical, logical)
+
+    def observe_cluster_time(self, timestamp):
+        """Merge a bson Timestamp (clusterTime / operationTime)"""
+        if timestamp is not None:
+            self.receive(from_bson_timestamp(timestamp))
+
+    def observe_session(self, session):
+        """Merge the operationTime and clusterTime of the session's last response"""
+        self.observe_cluster_time(session.operation_time)
+        if session.cluster_time:
+            self.observe_cluster_time(session.cluster_time.get('clusterTime'))
@@ -0,0 +1,186 @@
+"""
+Part D: Journal Commit Interval Sweep
+Sets journalCommitInterval on every member and crosses it with j=True/False
+and w=1/majority/3 under concurrent closed-loop inserts, so journal flush
+cost and group commit show up separately from replication cost. The
+original interval is restored on every member afterwards.
+"""
+
+from pymongo import MongoClient, WriteConcern
+from pymongo.errors import OperationFailure, PyMongoError
+import os
+import threading
+import time
+import traceback
+
+from cluster import direct_client, get_members
+from load_generator import LatencyHistogram
+
+
+class JournalSweepExperiments:
+    W_VALUES = (1, "majority", 3)
+
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+
+    def _members(self):
+        return [m['name'] for m in get_members(self.client) if m.get('health') == 1]
+
+    def _get_interval(self, host):
+        member = direct_client(host)
+        try:
+            return member.admin.command('getParameter', 1, journalCommitInterval=1)['journalCommitInterval']
+        finally:
+            member.close()
+
+    def _set_interval(self, host, interval_ms):
+        member = direct_client(host)
+        try:
+            member.admin.command('setParameter', 1, journalCommitInterval=interval_ms)
+        finally:
+            member.close()
+
+    def _run(self, collection, workers, duration):
+        """Closed-loop inserts from `workers` threads for `duration` seconds"""
+        histogram = LatencyHistogram()
+        lock = threading.Lock()
+        counters = {"ops": 0, "errors": 0}
+        start_barrier = threading.Barrier(workers + 1)
+        stop_event = threading.Event()
+        payload = "x" * 1000  # 1KB data
+
+        def loop(worker_id):
+            local = LatencyHistogram()
+            ops = errors = 0
+            start_barrier.wait()
+            while not stop_event.is_set():
+                start = time.perf_counter()
+                try:
+                    collection.insert_one({"worker": worker_id, "data": payload})
+                    local.record((time.perf_counter() - start) * 1000)
+                    ops += 1
+                except PyMongoError:
+                    errors += 1
+            with lock:
+                histogram.merge(local)
+                counters["ops"] += ops
+                counters["errors"] += errors
+
+        threads = [threading.Thread(target=loop, args=(w,)) for w in range(workers)]
+        for t in threads:
+            t.start()
+        start_barrier.wait()
+        started = time.perf_counter()
+        time.sleep(duration)
+        stop_event.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        return {"throughput": counters["ops"] / elapsed, "errors": counters["errors"],
+                "latency": histogram.summary()}
+
+    def journal_sweep(self, intervals_ms=(1, 10, 50, 100, 200), concurrencies=(1, 32), duration=3):
+        """
+        For every journalCommitInterval: j=True/False x w=1/majority/3 at each
+        concurrency. At concurrency 1 every j=True write pays a flush; with
+        more writers, concurrent writes share one flush (group commit)
+        """
+        print("\n" + "─"*70)
+        print("Journal Commit Interval Sweep")
+        print("─"*70)
+
+        members = self._members()
+        try:
+            original = {host: self._get_interval(host) for host in members}
+        except OperationFailure as e:
+            print(f"❌ journalCommitInterval is not available on this deployment: {e}")
+            return None
+        print(f"Members: {', '.join(f'{h} ({v}ms)' for h, v in original.items())}; {duration}s per cell")
+
+        self.db['journal_sweep_test'].drop()
+        self.db.create_collection('journal_sweep_test')
+        results = {}
+        try:
+            for interval in intervals_ms:
+                for host in members:
+                    self._set_interval(host, interval)
+                print(f"\n{'─'*70}")
+                print(f"journalCommitInterval = {interval}ms")
+                print(f"{'─'*70}")
+                print(f"  {'writers':>7} {'j':6} {'w':9} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                      f"{'p99 ms':>8} {'errors':>7}")
+                for workers in concurrencies:
+                    for j in (True, False):
+                        for w_value in self.W_VALUES:
+                            collection = self.db.get_collection(
+                                'journal_sweep_test', write_concern=WriteConcern(w=w_value, j=j, wtimeout=5000))
+                            result = self._run(collection, workers, duration)
+                            results[(interval, workers, j, w_value)] = result
+                            latency = result["latency"]
+                            print(f"  {workers:>7} {str(j):6} {str(w_value):9} {result['throughput']:>9.0f} "
+                                  f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f} "
+                                  f"{result['errors']:>7}")
+        finally:
+            failed = []
+            for host, value in original.items():
+                try:
+                    self._set_interval(host, value)
+                except PyMongoError as e:
+                    failed.append((host, value, e))
+            print(f"\nRestored journalCommitInterval on {len(original) - len(failed)} of {len(original)} members")
+            for host, value, e in failed:
+                print(f"   ❌ {host}: could not restore {value}ms ({e}); "
+                      f"run setParameter journalCommitInterval={value} on it by hand")
+
+        workers = concurrencies[-1]
+        print(f"\n j=True Cost at {workers} writers (p50 j=True - p50 j=False, ms):")
+        print(f"  {'interval':>8} " + " ".join(f"{'w=' + str(w):>12}" for w in self.W_VALUES))
+        for interval in intervals_ms:
+            costs = [results[(interval, workers, True, w)]["latency"]["p50"]
+                     - results[(interval, workers, False, w)]["latency"]["p50"] for w in self.W_VALUES]
+            print(f"  {interval:>6}ms " + " ".join(f"{cost:>12.2f}" for cost in costs))
+
+        if len(concurrencies) > 1:
+            print(f"\n Group Commit (j=True, w=1 throughput at {workers} writers / at {concurrencies[0]}):")
+            for interval in intervals_ms:
+                single = results[(interval, concurrencies[0], True, 1)]["throughput"]
+                many = results[(interval, workers, True, 1)]["throughput"]
+                print(f"   {interval:>4}ms -> {many / single if single else 0.0:.1f}x")
+
+        print(f"\n Notes:")
+        print(f"   j=True forces a journal flush on the primary; concurrent writers share it")
+        print(f"   w=majority waits for the secondaries' journals (writeConcernMajorityJournalDefault),")
+        print(f"   so the interval shows up there even with j=False")
+        print("="*70)
+        return results
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Journal Commit Interval Sweep")
+    print("="*70)
+
+    experiments = JournalSweepExperiments()
+
+    try:
+        experiments.journal_sweep()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
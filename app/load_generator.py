@@ -0,0 +1,327 @@
+"""
+Part D: Open-loop Load Generator
+Schedules operations at a target arrival rate (fixed or Poisson) instead of
+waiting for the previous operation, so queueing delay shows up in latency
+"""
+
+from pymongo import MongoClient, WriteConcern, ReadPreference
+from pymongo.read_concern import ReadConcern
+from concurrent.futures import ThreadPoolExecutor
+import math
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from fixtures import Fixtures
+
+
+class LatencyHistogram:
+    """
+    Mergeable latency histogram with logarithmic buckets (~1% relative error)
+    Only bucket counts are stored, so it stays small for millions of samples
+    and can be pickled between processes and merged afterwards
+    """
+
+    MIN_MS = 0.001
+    GROWTH = 1.01
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, latency_ms):
+        latency_ms = max(latency_ms, self.MIN_MS)
+        bucket = math.ceil(math.log(latency_ms / self.MIN_MS, self.GROWTH))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += latency_ms
+        self.min = min(self.min, latency_ms)
+        self.max = max(self.max, latency_ms)
+
+    def merge(self, other):
+        for bucket, n in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, p):
+        """Return the latency (ms) at percentile p (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.MIN_MS * self.GROWTH ** bucket, self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max if self.count else 0.0,
+        }
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def sleep_until(deadline):
+    """Sleep until perf_counter() reaches deadline, spinning for the last ms"""
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return
+        if remaining > 0.002:
+            time.sleep(remaining - 0.001)
+
+
+class OpenLoopGenerator:
+    """
+    Fires operation(i) at intended times t0 + k/rate (fixed) or with
+    exponential inter-arrival gaps (Poisson). Operations run on a worker pool,
+    so a slow operation never delays the schedule. Latency is measured from
+    the intended start time, which includes any time spent queued.
+    """
+
+    def __init__(self, operation, rate, duration, arrivals="fixed",
+                 max_workers=64, seed=None):
+        if arrivals not in ("fixed", "poisson"):
+            raise ValueError(f"Unknown arrival process: {arrivals}")
+        self.operation = operation
+        self.rate = rate
+        self.duration = duration
+        self.arrivals = arrivals
+        self.max_workers = max_workers
+        self.random = random.Random(seed)
+
+    def _intended_times(self, t0):
+        t = t0
+        end = t0 + self.duration
+        while True:
+            if self.arrivals == "fixed":
+                t += 1.0 / self.rate
+            else:
+                t += self.random.expovariate(self.rate)
+            if t >= end:
+                return
+            yield t
+
+    def run(self):
+        histogram = LatencyHistogram()
+        lock = threading.Lock()
+        stats = {"completed": 0, "errors": 0, "last_done": 0.0,
+                 "outstanding": 0, "max_outstanding": 0, "max_dispatch_lag_ms": 0.0}
+
+        def execute(i, intended):
+            try:
+                self.operation(i)
+                ok = True
+            except Exception:
+                ok = False
+            done = time.perf_counter()
+            with lock:
+                stats["outstanding"] -= 1
+                stats["last_done"] = max(stats["last_done"], done)
+                if ok:
+                    stats["completed"] += 1
+                    histogram.record((done - intended) * 1000)
+                else:
+                    stats["errors"] += 1
+
+        scheduled = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            t0 = time.perf_counter() + 0.01
+            for intended in self._intended_times(t0):
+                sleep_until(intended)
+                lag_ms = (time.perf_counter() - intended) * 1000
+                with lock:
+                    stats["outstanding"] += 1
+                    stats["max_outstanding"] = max(stats["max_outstanding"], stats["outstanding"])
+                    stats["max_dispatch_lag_ms"] = max(stats["max_dispatch_lag_ms"], lag_ms)
+                pool.submit(execute, scheduled, intended)
+                scheduled += 1
+
+        elapsed = max(stats["last_done"] - t0, self.duration)
+        return {
+            "target_rate": self.rate,
+            "scheduled": scheduled,
+            "completed": stats["completed"],
+            "errors": stats["errors"],
+            "throughput": stats["completed"] / elapsed,
+            "max_outstanding": stats["max_outstanding"],
+            "max_dispatch_lag_ms": stats["max_dispatch_lag_ms"],
+            "latency": histogram.summary(),
+            "histogram": histogram,
+        }
+
+
+class OpenLoopExperiments:
+    # (name, write concern, read concern, read preference, description)
+    CONFIGURATIONS = [
+        ("strong", WriteConcern(w="majority", wtimeout=5000), ReadConcern("majority"),
+         ReadPreference.PRIMARY, "w='majority' + readConcern 'majority'"),
+        ("eventual", WriteConcern(w=1), ReadConcern("local"),
+         ReadPreference.SECONDARY_PREFERRED, "w=1 + secondaryPreferred"),
+        ("all_nodes", WriteConcern(w=3, wtimeout=5000), ReadConcern("local"),
+         ReadPreference.PRIMARY, "w=3 + primary reads"),
+    ]
+
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string, maxPoolSize=200)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+
+    def _make_operation(self, write_collection, read_collection, write_ratio, seed):
+        """Mixed insert/find_one workload; reads target recently written ids"""
+        rng = random.Random(seed)
+        payload = "x" * 1000  # 1KB data
+
+        def operation(i):
+            if i < 10 or rng.random() < write_ratio:
+                write_collection.insert_one({
+                    "test_id": f"open_loop_{i}",
+                    "seq": i,
+                    "timestamp": datetime.now(),
+                    "data": payload
+                })
+            else:
+                read_collection.find_one({"seq": rng.randrange(max(1, i - 100), i)})
+
+        return operation
+
+    def rate_sweep(self, start_rate=50, growth=1.5, max_rate=5000, step_duration=5,
+                   arrivals="poisson", write_ratio=0.5, max_workers=128):
+        """
+        For each consistency configuration, increase the arrival rate step by
+        step until the cluster can no longer keep up (the saturation knee):
+        achieved throughput falls below 95% of target, or p99 grows beyond
+        5x the p99 seen at the lowest rate
+        """
+        print("\n" + "-"*70)
+        print("Open-loop Rate Sweep (Saturation Knee)")
+        print("-"*70)
+        print(f"Arrivals: {arrivals}, step duration: {step_duration}s, "
+              f"write ratio: {write_ratio:.0%}, workers: {max_workers}")
+
+        knees = {}
+        lagging_steps = 0
+        for name, write_concern, read_concern, read_preference, description in self.CONFIGURATIONS:
+            print(f"\n{'─'*70}")
+            print(f"Test Configuration: {name} ({description})")
+            print(f"{'─'*70}")
+
+            write_collection = self.db.get_collection('open_loop_test', write_concern=write_concern)
+            read_collection = self.db.get_collection(
+                'open_loop_test',
+                read_concern=read_concern,
+                read_preference=read_preference
+            )
+            print(f"  {'target/s':>9} {'achieved/s':>11} {'p50 ms':>8} {'p95 ms':>8} "
+                  f"{'p99 ms':>9} {'errors':>7} {'queue':>6} {'lag ms':>8}")
+
+            baseline_p99 = None
+            last_good = None
+            rate = start_rate
+            while rate <= max_rate:
+                self.fixtures.reset('open_loop_test')
+                self.fixtures.settle()
+                generator = OpenLoopGenerator(
+                    self._make_operation(write_collection, read_collection, write_ratio, seed=int(rate)),
+                    rate=rate,
+                    duration=step_duration,
+                    arrivals=arrivals,
+                    max_workers=max_workers,
+                    seed=int(rate)
+                )
+                result = generator.run()
+                latency = result["latency"]
+                # the generator itself fell behind: latencies include its own dispatch delay
+                lagging = result['max_dispatch_lag_ms'] > 1000 / rate
+                lagging_steps += lagging
+                print(f"  {rate:>9.0f} {result['throughput']:>11.1f} {latency['p50']:>8.2f} "
+                      f"{latency['p95']:>8.2f} {latency['p99']:>9.2f} {result['errors']:>7} "
+                      f"{result['max_outstanding']:>6} {result['max_dispatch_lag_ms']:>8.2f}"
+                      + ("  ⚠️ generator lag" if lagging else ""))
+
+                if baseline_p99 is None:
+                    baseline_p99 = max(latency['p99'], 0.1)
+                saturated = (result['throughput'] < 0.95 * rate
+                             or latency['p99'] > 5 * baseline_p99)
+                if saturated:
+                    break
+                last_good = rate
+                rate *= growth
+
+            knees[name] = last_good
+            if last_good is None:
+                print(f"  Saturated already at {start_rate}/s")
+            elif rate > max_rate:
+                print(f"  No knee found up to {max_rate}/s")
+            else:
+                print(f"  Saturation knee: ~{last_good:.0f} ops/s "
+                      f"(saturated at {rate:.0f} ops/s)")
+
+        print(f"\n Saturation Summary:")
+        for name, knee in knees.items():
+            knee_text = f"~{knee:.0f} ops/s" if knee else "below start rate"
+            print(f"   {name:10} -> {knee_text}")
+        print(f"\n Notes:")
+        print(f"   lag ms = worst delay between an intended send time and the actual dispatch")
+        if lagging_steps:
+            print(f"   ⚠️  {lagging_steps} step(s) dispatched later than one inter-arrival interval: "
+                  f"the generator, not the cluster, limited those rates")
+        print("="*70)
+        return knees
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Open-loop Load Generator")
+    print("="*70)
+
+    experiments = OpenLoopExperiments()
+
+    try:
+        experiments.rate_sweep()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Dockerless Local Cluster Launcher
+Starts a replica set of local mongod processes on ephemeral ports with data
+directories on tmpfs, waits until a primary has been elected, and exposes
+the connection string to the experiments through MONGO_URI.
+
+    python local_cluster.py                  # start, print MONGO_URI, Ctrl-C to stop
+    python local_cluster.py python main.py   # run a command against the cluster, then tear down
+"""
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from cluster import direct_client
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def tmpfs_root():
+    """/dev/shm when available (memory-backed), otherwise the default temp directory"""
+    return '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+
+class LocalCluster:
+    """
+    Replica set of `members` local mongod processes, same layout as
+    docker-compose.yml (first member priority 2). Use as a context manager
+    or call start()/stop().
+    """
+
+    def __init__(self, members=3, replica_set='rs0', mongod='mongod', data_root=None,
+                 extra_args=(), export_uri=True):
+        self.members = members
+        self.replica_set = replica_set
+        self.mongod = mongod
+        self.data_root = data_root or tmpfs_root()
+        self.extra_args = list(extra_args)
+        self.export_uri = export_uri
+        self.base_dir = None
+        self.processes = []
+        self.commands = []
+        self.hosts = []
+        self.previous_uri = None
+        self.exported = False
+
+    @property
+    def uri(self):
+        return f"mongodb://{','.join(self.hosts)}/?replicaSet={self.replica_set}"
+
+    def _start_member(self, index):
+        dbpath = os.path.join(self.base_dir, f"node{index}")
+        os.makedirs(dbpath)
+        port = free_port()
+        command = [self.mongod, '--replSet', self.replica_set, '--port', str(port),
+                   '--bind_ip', '127.0.0.1', '--dbpath', dbpath,
+                   '--logpath', os.path.join(dbpath, 'mongod.log'), '--logappend',
+                   '--wiredTigerCacheSizeGB', '0.25', '--setParameter', 'diagnosticDataCollectionEnabled=false']
+        command += self.extra_args
+        self.processes.append(subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        self.commands.append(command)
+        self.hosts.append(f"127.0.0.1:{port}")
+
+    def restart_member(self, host, timeout=60):
+        """Start `host` again on its port and data directory, e.g. after a shutdown command"""
+        index = self.hosts.index(host)
+        try:
+            self.processes[index].wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.processes[index].kill()
+            self.processes[index].wait()
+        self.processes[index] = subprocess.Popen(
+            self.commands[index], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait_for_ping(host, self.processes[index], time.monotonic() + timeout)
+
+    def _wait_for_ping(self, host, process, deadline):
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"mongod on {host} exited with code {process.returncode}")
+            client = direct_client(host, serverSelectionTimeoutMS=200)
+            try:
+                client.admin.command('ping')
+                return
+            except PyMongoError:
+                time.sleep(0.05)
+            finally:
+                client.close()
+        raise TimeoutError(f"mongod on {host} did not start")
+
+    def _wait_for_primary(self, deadline):
+        client = MongoClient(self.uri, serverSelectionTimeoutMS=200)
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    if client.admin.command('hello').get('isWritablePrimary'):
+                        return client.primary
+                except PyMongoError:
+                    pass
+                time.sleep(0.05)
+        finally:
+            client.close()
+        raise TimeoutError("No primary elected")
+
+    def start(self, timeout=60):
+        """Start the members, initiate the replica set and wait for a primary"""
+        started = time.monotonic()
+        deadline = started + timeout
+        self.base_dir = tempfile.mkdtemp(prefix='ds-lab-', dir=self.data_root)
+        try:
+            for i in range(self.members):
+                self._start_member(i)
+            for host, process in zip(self.hosts, self.processes):
+                self._wait_for_ping(host, process, deadline)
+
+            config = {
+                '_id': self.replica_set,
+                'members': [
+                    {'_id': i, 'host': host, 'priority': 2 if i == 0 else 1}
+                    for i, host in enumerate(self.hosts)
+                ]
+            }
+            client = direct_client(self.hosts[0])
+            try:
+                client.admin.command('replSetInitiate', config)
+            finally:
+                client.close()
+            primary = self._wait_for_primary(deadline)
+        except BaseException:
+            self.stop()
+            raise
+
+        if self.export_uri:
+            self.previous_uri = os.environ.get('MONGO_URI')
+            os.environ['MONGO_URI'] = self.uri
+            self.exported = True
+        print(f"✅ Local replica set {self.replica_set} ready in {time.monotonic() - started:.1f}s "
+              f"(primary {primary[0]}:{primary[1]}, data in {self.base_dir})")
+        return self
+
+    def stop(self, timeout=10):
+        """Terminate all members and remove their data directories"""
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.processes = []
+        self.commands = []
+        self.hosts = []
+        if self.base_dir:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+            self.base_dir = None
+        if self.exported:
+            if self.previous_uri is None:
+                os.environ.pop('MONGO_URI', None)
+            else:
+                os.environ['MONGO_URI'] = self.previous_uri
+            self.exported = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    command = sys.argv[1:]
+    cluster = LocalCluster()
+    cluster.start()
+    try:
+        print(f"export MONGO_URI='{cluster.uri}'")
+        if command:
+            return subprocess.call(command)
+        print("Press Ctrl-C to stop the cluster")
+        while all(p.poll() is None for p in cluster.processes):
+            time.sleep(1)
+        print("A mongod process exited, stopping the cluster")
+    except KeyboardInterrupt:
+        print("\nStopping the cluster...")
+    finally:
+        cluster.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,8 @@ import os
 import sys
 import traceback
 
+from profiler import enable_from_environment, profile_phase, profiled
+
 def print_header():
     print("\n" + "="*70)
     print("Distributed Data Management and Consistency Models")
@@ -28,11 +30,34 @@ def print_menu():
     print("  Comprehensive")
     print("    9. Run all Part B experiments")
     print("    10. Run all Part C experiments")
+    print("    11. Run all Part B + C experiments unattended (parallel scheduler)")
+    print("")
+    print("  Part D: Performance Benchmarks")
+    print("    12. Open-loop rate sweep (saturation knee)")
+    print("    13. Multiprocess load driver scaling")
+    print("    14. Hot-document contention workload")
+    print("    15. Wire compression benchmark")
+    print("    16. Repeated-failover chaos loop")
+    print("    17. Acknowledged-write loss audit across failover")
+    print("    18. Retry policy benchmark through stepdowns")
+    print("    19. Analytics interference on secondaries")
+    print("    20. Write coalescer linger benchmark")
+    print("    21. Bounded-staleness read cache benchmark")
+    print("    22. Raw-BSON read decode benchmark")
+    print("    23. Sharded cluster experiments")
+    print("    24. Adaptive consistency controller SLO benchmark")
+    print("    25. Change-stream fan-out benchmark")
+    print("    26. Hedged secondary reads benchmark")
+    print("    27. Connection pool sizing study")
+    print("    28. Secondary catch-up and oplog window benchmark")
+    print("    29. Journal commit interval sweep")
+    print("    30. Acknowledged-write loss audit, primary kill (local mongod cluster)")
     print("")
     print("    Q. Exit")
     print("─"*70)
 
 
+@profiled
 def run_part_a():
     print("\n" + "="*70)
     print("Start Part A: Basic Setup")
@@ -49,18 +74,22 @@ def run_part_b_all():
         experiments.show_replica_info()
         
         input("\nPress Enter to continue: Write Concern Experiment...")
-        experiments.write_concerns()
+        with profile_phase("write_concerns"):
+            experiments.write_concerns()
         
         input("\nPress Enter to continue: Data Propagation Experiment...")
-        experiments.data_propagation_test()
+        with profile_phase("data_propagation_test"):
+            experiments.data_propagation_test()
         
         input("\nPress Enter to continue: Failover Experiment...")
-        experiments.leader_failover()
+        with profile_phase("leader_failover"):
+            experiments.leader_failover()
         
         print("\n All Part B experiments completed!")
     finally:
         experiments.close()
 
+@profiled
 def run_part_b_write_concern():
     """only run the Write Concern experiment"""
     from replication import ReplicationExperiments
@@ -71,6 +100,7 @@ def run_part_b_write_concern():
     finally:
         experiments.close()
 
+@profiled
 def run_part_b_data_propagation():
     """only run the Data Propagation experiment"""
     from replication import ReplicationExperiments
@@ -81,6 +111,7 @@ def run_part_b_data_propagation():
     finally:
         experiments.close()
 
+@profiled
 def run_part_b_failover():
     """only run the Failover experiment"""
     from replication import ReplicationExperiments
@@ -100,21 +131,32 @@ def run_part_c_all():
     experiments = ConsistencyExperiments()
     try:
         input("\nPress Enter to continue: Strong Consistency Experiment...")
-        experiments.experiment_1_strong_consistency()
+        with profile_phase("experiment_1_strong_consistency"):
+            experiments.experiment_1_strong_consistency()
         
         input("\nPress Enter to continue: Eventual Consistency Experiment...")
-        experiments.experiment_2_eventual_consistency()
+        with profile_phase("experiment_2_eventual_consistency"):
+            experiments.experiment_2_eventual_consistency()
         
         input("\nPress Enter to continue: Consistency Comparison Experiment...")
-        experiments.experiment_3_consistency_comparison()
+        with profile_phase("experiment_3_consistency_comparison"):
+            experiments.experiment_3_consistency_comparison()
 
         input("\nPress Enter to continue: Causal Consistency Experiment...")
-        experiments.experiment_4_causal_consistency()
+        with profile_phase("experiment_4_causal_consistency"):
+            experiments.experiment_4_causal_consistency()
         
         print("\n All Part C experiments completed!")
     finally:
         experiments.close()
 
+@profiled
+def run_suite_parallel():
+    """run all Part B and C experiments unattended, timing-insensitive ones in parallel"""
+    from scheduler import ExperimentScheduler, SUITES
+    ExperimentScheduler().run(SUITES['all'])
+
+@profiled
 def run_part_c_strong():
     """only run the Strong Consistency experiment"""
     from consistency import ConsistencyExperiments
@@ -124,6 +166,7 @@ def run_part_c_strong():
     finally:
         experiments.close()
 
+@profiled
 def run_part_c_eventual():
     """only run the Eventual Consistency experiment"""
     from consistency import ConsistencyExperiments
@@ -133,6 +176,7 @@ def run_part_c_eventual():
     finally:
         experiments.close()
 
+@profiled
 def run_part_c_comparison():
     """only run the Consistency Comparison experiment"""
     from consistency import ConsistencyExperiments
@@ -142,6 +186,7 @@ def run_part_c_comparison():
     finally:
         experiments.close()
 
+@profiled
 def run_part_c_causal():
     """only run the Causal Consistency experiment"""
     from consistency import ConsistencyExperiments
@@ -152,13 +197,202 @@ def run_part_c_causal():
         experiments.close()
 
 
+@profiled
+def run_part_d_open_loop():
+    """only run the open-loop rate sweep"""
+    from load_generator import OpenLoopExperiments
+    experiments = OpenLoopExperiments()
+    try:
+        experiments.rate_sweep()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_multiprocess():
+    """only run the multiprocess load driver scaling"""
+    from multiprocess_driver import MultiprocessExperiments
+    experiments = MultiprocessExperiments()
+    try:
+        experiments.process_scaling()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_contention():
+    """only run the hot-document contention workload"""
+    from contention import ContentionExperiments
+    experiments = ContentionExperiments()
+    try:
+        experiments.contention_sweep()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_compression():
+    """only run the wire compression benchmark"""
+    from compression import CompressionExperiments
+    experiments = CompressionExperiments()
+    try:
+        experiments.compression_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_chaos():
+    """only run the repeated-failover chaos loop"""
+    from chaos import ChaosExperiments
+    experiments = ChaosExperiments()
+    try:
+        experiments.failover_chaos()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_write_loss():
+    """only run the acknowledged-write loss audit across failover"""
+    from write_loss_audit import WriteLossAuditExperiments
+    experiments = WriteLossAuditExperiments()
+    try:
+        experiments.audit()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_retry_policy():
+    """only run the retry policy benchmark through stepdowns"""
+    from retry_policy import RetryPolicyExperiments
+    experiments = RetryPolicyExperiments()
+    try:
+        experiments.policy_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_analytics():
+    """only run the analytics interference on secondaries"""
+    from analytics_interference import AnalyticsInterferenceExperiments
+    experiments = AnalyticsInterferenceExperiments()
+    try:
+        experiments.interference_test()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_coalescer():
+    """only run the write coalescer linger benchmark"""
+    from write_coalescer import WriteCoalescerExperiments
+    experiments = WriteCoalescerExperiments()
+    try:
+        experiments.linger_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_read_cache():
+    """only run the bounded-staleness read cache benchmark"""
+    from read_cache import ReadCacheExperiments
+    experiments = ReadCacheExperiments()
+    try:
+        experiments.cache_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_raw_reads():
+    """only run the raw-BSON read decode benchmark"""
+    from raw_reads import RawReadExperiments
+    experiments = RawReadExperiments()
+    try:
+        experiments.decode_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_sharding():
+    """only run the sharded cluster experiments"""
+    from sharding import ShardingExperiments
+    experiments = ShardingExperiments()
+    try:
+        experiments.run_all()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_adaptive():
+    """only run the adaptive consistency controller SLO benchmark"""
+    from adaptive_consistency import AdaptiveConsistencyExperiments
+    experiments = AdaptiveConsistencyExperiments()
+    try:
+        experiments.slo_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_change_streams():
+    """only run the change-stream fan-out benchmark"""
+    from change_stream_fanout import ChangeStreamFanoutExperiments
+    experiments = ChangeStreamFanoutExperiments()
+    try:
+        experiments.fanout_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_hedged_reads():
+    """only run the hedged secondary reads benchmark"""
+    from hedged_reads import HedgedReadExperiments
+    experiments = HedgedReadExperiments()
+    try:
+        experiments.hedge_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_pool_sizing():
+    """only run the connection pool sizing study"""
+    from pool_sizing import PoolSizingExperiments
+    experiments = PoolSizingExperiments()
+    try:
+        experiments.pool_sweep()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_catchup():
+    """only run the secondary catch-up and oplog window benchmark"""
+    from catchup import CatchUpExperiments
+    experiments = CatchUpExperiments()
+    try:
+        experiments.catchup_benchmark()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_journal():
+    """only run the journal commit interval sweep"""
+    from journal_sweep import JournalSweepExperiments
+    experiments = JournalSweepExperiments()
+    try:
+        experiments.journal_sweep()
+    finally:
+        experiments.close()
+
+@profiled
+def run_part_d_write_loss_kill():
+    """only run the write loss audit with a killed primary on a local mongod cluster"""
+    from write_loss_audit import audit_local_kill
+    audit_local_kill()
+
+
 
 def main():
     print_header()
+    if enable_from_environment(sys.argv[1:]):
+        print("Profiling enabled: collapsed stacks and allocation sites are written to profiles/")
     
     while True:
         print_menu()
-        choice = input("\nPlease select the operation (1-10, Q): ").strip().upper()
+        choice = input("\nPlease select the operation (1-30, Q): ").strip().upper()
         
         try:
             if choice == '1':
@@ -181,6 +415,46 @@ def main():
                 run_part_b_all()
             elif choice == '10':
                 run_part_c_all()
+            elif choice == '11':
+                run_suite_parallel()
+            elif choice == '12':
+                run_part_d_open_loop()
+            elif choice == '13':
+                run_part_d_multiprocess()
+            elif choice == '14':
+                run_part_d_contention()
+            elif choice == '15':
+                run_part_d_compression()
+            elif choice == '16':
+                run_part_d_chaos()
+            elif choice == '17':
+                run_part_d_write_loss()
+            elif choice == '18':
+                run_part_d_retry_policy()
+            elif choice == '19':
+                run_part_d_analytics()
+            elif choice == '20':
+                run_part_d_coalescer()
+            elif choice == '21':
+                run_part_d_read_cache()
+            elif choice == '22':
+                run_part_d_raw_reads()
+            elif choice == '23':
+                run_part_d_sharding()
+            elif choice == '24':
+                run_part_d_adaptive()
+            elif choice == '25':
+                run_part_d_change_streams()
+            elif choice == '26':
+                run_part_d_hedged_reads()
+            elif choice == '27':
+                run_part_d_pool_sizing()
+            elif choice == '28':
+                run_part_d_catchup()
+            elif choice == '29':
+                run_part_d_journal()
+            elif choice == '30':
+                run_part_d_write_loss_kill()
             elif choice == 'Q':
                 print("\n Goodbye!")
                 break
@@ -1,16 +1,24 @@
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
+import os
 import time
 from datetime import datetime
 
+from fixtures import Fixtures
+
 class DistributedLabClient:
     def __init__(self):
         """Initialize the MongoDB replica set connection"""
         # Connection string - contains all 3 nodes
-        self.connection_string = "mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0"
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
         self.client = None
         self.db = None
         self.users_collection = None
+        self.fixtures = None
+        self.read_cache = None
         
     def connect(self):
         """Connect to the MongoDB replica set"""
@@ -25,6 +33,7 @@ class DistributedLabClient:
             # Select the database and collection
             self.db = self.client['lab2_distributed_db']
             self.users_collection = self.db['user_profiles']
+            self.fixtures = Fixtures(self.db)
             
             # Show the replica set status
             self.show_replica_status()
@@ -83,8 +92,8 @@ class DistributedLabClient:
             }
         ]
         
-        # Clear existing data (for testing)
-        self.users_collection.delete_many({})
+        # Fresh collection (for testing); the old one is dropped in the background
+        self.fixtures.reset('user_profiles')
         
         # Insert data
         result = self.users_collection.insert_many(sample_users)
@@ -95,19 +104,38 @@ class DistributedLabClient:
         for user in self.users_collection.find():
             print(f"  - {user['username']} (ID: {user['user_id']}) - {user['email']}")
     
-    def read_user(self, user_id):
-        """Read a single user"""
-        user = self.users_collection.find_one({"user_id": user_id})
+    def enable_read_cache(self, max_staleness=1.0, ttl=30.0, max_entries=10000):
+        """Serve read_user from a change-stream-invalidated cache with a staleness ceiling"""
+        from read_cache import BoundedStalenessCache
+        self.read_cache = BoundedStalenessCache(
+            self.users_collection,
+            max_entries=max_entries,
+            ttl=ttl,
+            max_staleness=max_staleness
+        ).start()
+    
+    def read_user(self, user_id, projection=None, raw=False):
+        """Read a single user (raw=True returns a lazily decoded RawBSONDocument)"""
+        if self.read_cache and projection is None and not raw:
+            user = self.read_cache.get(user_id)
+        else:
+            from raw_reads import raw_collection
+            collection = raw_collection(self.users_collection) if raw else self.users_collection
+            user = collection.find_one({"user_id": user_id}, projection)
         if user:
-            print(f"\nRead user: {user['username']}")
-            print(f"   Email: {user['email']}")
-            print(f"   Last login: {user['last_login_time']}")
+            print(f"\nRead user: {user.get('username')}")
+            print(f"   Email: {user.get('email')}")
+            print(f"   Last login: {user.get('last_login_time')}")
         else:
             print(f"\nUser ID not found: {user_id}")
         return user
     
     def close(self):
         """Close the connection"""
+        if self.read_cache:
+            self.read_cache.close()
+        if self.fixtures:
+            self.fixtures.close()
         if self.client:
             self.client.close()
             print("\nDisconnected")
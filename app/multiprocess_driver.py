@@ -0,0 +1,243 @@
+"""
+Part D: Multiprocess Load Driver
+Runs the workload in K worker processes (each with its own MongoClient) so
+BSON encoding and other client-side CPU does not hit the GIL before the
+replica set is saturated
+"""
+
+from pymongo import MongoClient
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from fixtures import Fixtures
+from load_generator import LatencyHistogram, OpenLoopExperiments
+
+
+def _run_worker(worker_id, num_workers, connection_string, config_name, duration,
+                threads, write_ratio, barrier, results):
+    """
+    Worker process body: connect, wait on the start barrier, run `threads`
+    closed-loop threads for `duration` seconds and report a histogram plus
+    counters. Worker k only touches sequence numbers k, k+K, k+2K, ...
+    """
+    client = MongoClient(connection_string, maxPoolSize=threads * 2)
+    try:
+        _, write_concern, read_concern, read_preference, _ = next(
+            c for c in OpenLoopExperiments.CONFIGURATIONS if c[0] == config_name)
+        db = client['lab2_distributed_db']
+        write_collection = db.get_collection('multiprocess_test', write_concern=write_concern)
+        read_collection = db.get_collection(
+            'multiprocess_test',
+            read_concern=read_concern,
+            read_preference=read_preference
+        )
+        client.admin.command('ping')  # open the pool before the timed phase
+
+        histogram = LatencyHistogram()
+        counters = {"writes": 0, "reads": 0, "errors": 0}
+        lock = threading.Lock()
+        local_seq = itertools.count()
+        payload = "x" * 1000  # 1KB data
+
+        def loop(thread_id, deadline):
+            rng = random.Random(worker_id * 1000 + thread_id)
+            local = LatencyHistogram()
+            writes = reads = errors = 0
+            written = 0
+            while time.perf_counter() < deadline:
+                is_write = written < 1 or rng.random() < write_ratio
+                start = time.perf_counter()
+                try:
+                    if is_write:
+                        seq = worker_id + num_workers * next(local_seq)
+                        write_collection.insert_one({
+                            "seq": seq,
+                            "worker": worker_id,
+                            "timestamp": datetime.now(),
+                            "data": payload
+                        })
+                        written = seq
+                        writes += 1
+                    else:
+                        read_collection.find_one({"seq": written})
+                        reads += 1
+                    local.record((time.perf_counter() - start) * 1000)
+                except Exception:
+                    errors += 1
+            with lock:
+                histogram.merge(local)
+                counters["writes"] += writes
+                counters["reads"] += reads
+                counters["errors"] += errors
+
+        barrier.wait()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        deadline = start + duration
+        pool = [threading.Thread(target=loop, args=(t, deadline)) for t in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        results.put({
+            "worker": worker_id,
+            "elapsed": elapsed,
+            "cpu": time.process_time() - cpu_start,
+            "counters": counters,
+            "histogram": histogram,
+        })
+    except Exception as e:
+        results.put({"worker": worker_id, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        client.close()
+
+
+class MultiprocessDriver:
+    """Starts K worker processes behind a barrier and merges their results"""
+
+    def __init__(self, connection_string, num_processes, threads_per_process=8):
+        self.connection_string = connection_string
+        self.num_processes = num_processes
+        self.threads_per_process = threads_per_process
+        # spawn: MongoClient is not fork-safe
+        self.context = multiprocessing.get_context("spawn")
+
+    def run(self, config_name, duration=10, write_ratio=0.5):
+        barrier = self.context.Barrier(self.num_processes)
+        results = self.context.Queue()
+        processes = [
+            self.context.Process(
+                target=_run_worker,
+                args=(k, self.num_processes, self.connection_string, config_name, duration,
+                      self.threads_per_process, write_ratio, barrier, results)
+            )
+            for k in range(self.num_processes)
+        ]
+        for p in processes:
+            p.start()
+
+        merged = LatencyHistogram()
+        totals = {"writes": 0, "reads": 0, "errors": 0}
+        cpu = []
+        elapsed = 0.0
+        failures = []
+        try:
+            for _ in processes:
+                result = results.get(timeout=duration + 120)
+                if "error" in result:
+                    failures.append(result)
+                    barrier.abort()
+                    continue
+                merged.merge(result["histogram"])
+                for key in totals:
+                    totals[key] += result["counters"][key]
+                cpu.append(result["cpu"] / result["elapsed"])
+                elapsed = max(elapsed, result["elapsed"])
+        except queue.Empty:
+            failures.append({"worker": None, "error": "timed out waiting for workers"})
+        finally:
+            for p in processes:
+                p.join(timeout=10)
+                if p.is_alive():
+                    p.terminate()
+
+        ops = totals["writes"] + totals["reads"]
+        return {
+            "processes": self.num_processes,
+            "ops": ops,
+            "throughput": ops / elapsed if elapsed else 0.0,
+            "counters": totals,
+            "latency": merged.summary(),
+            "histogram": merged,
+            "cpu_per_process": cpu,
+            "failures": failures,
+        }
+
+
+class MultiprocessExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+        self.test_collection = self.db['multiprocess_test']
+
+    def process_scaling(self, process_counts=(1, 2, 4, 8), threads_per_process=8,
+                        duration=10, write_ratio=0.5):
+        """
+        Run the same mixed workload with an increasing number of driver
+        processes. When throughput stops growing while driver CPU is well
+        below one core per process, the cluster (not the client) is the
+        bottleneck.
+        """
+        print("\n" + "-"*70)
+        print("Multiprocess Load Driver Scaling")
+        print("-"*70)
+        print(f"Threads per process: {threads_per_process}, duration: {duration}s, "
+              f"write ratio: {write_ratio:.0%}")
+
+        for name, _, _, _, description in OpenLoopExperiments.CONFIGURATIONS:
+            print(f"\n{'─'*70}")
+            print(f"Test Configuration: {name} ({description})")
+            print(f"{'─'*70}")
+            print(f"  {'procs':>5} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+                  f"{'errors':>7} {'driver CPU':>11}")
+
+            for num_processes in process_counts:
+                self.fixtures.reset('multiprocess_test')
+                self.fixtures.settle()
+                driver = MultiprocessDriver(self.connection_string, num_processes, threads_per_process)
+                result = driver.run(name, duration=duration, write_ratio=write_ratio)
+
+                if result["failures"]:
+                    for failure in result["failures"]:
+                        print(f"  ❌ Worker {failure['worker']} failed: {failure['error']}")
+                    continue
+
+                latency = result["latency"]
+                avg_cpu = sum(result["cpu_per_process"]) / len(result["cpu_per_process"])
+                print(f"  {num_processes:>5} {result['throughput']:>10.1f} {latency['p50']:>8.2f} "
+                      f"{latency['p99']:>8.2f} {result['counters']['errors']:>7} "
+                      f"{avg_cpu:>10.0%}")
+                if avg_cpu > 0.9:
+                    print(f"        ⚠️  Driver processes are CPU-bound, add more processes")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Multiprocess Load Driver")
+    print("="*70)
+
+    experiments = MultiprocessExperiments()
+
+    try:
+        experiments.process_scaling()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
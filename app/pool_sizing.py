@@ -0,0 +1,249 @@
+"""
+Part D: Connection Pool Sizing Study
+Sweeps maxPoolSize against worker concurrency for the strong and eventual
+configurations, and minPoolSize / maxConnecting / waitQueueTimeoutMS at a
+fixed concurrency. Checkout wait is measured from connection pool events
+and reported separately from operation latency.
+"""
+
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+import os
+import random
+import threading
+import time
+import traceback
+
+from load_generator import LatencyHistogram, OpenLoopExperiments
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """
+    Checkout happens on the calling thread, so the wait is the time between
+    ConnectionCheckOutStarted and CheckedOut/CheckOutFailed on that thread;
+    last_wait_ms() returns it for the operation that just ran
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.created = 0
+        self.checkout_failures = 0
+
+    def last_wait_ms(self):
+        return getattr(self.local, "wait_ms", 0.0)
+
+    def reset_wait(self):
+        self.local.wait_ms = 0.0
+
+    def _finish_checkout(self):
+        started = getattr(self.local, "started", None)
+        if started is not None:
+            self.local.wait_ms = getattr(self.local, "wait_ms", 0.0) + (time.perf_counter() - started) * 1000
+            self.local.started = None
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._finish_checkout()
+
+    def connection_check_out_failed(self, event):
+        self._finish_checkout()
+        with self.lock:
+            self.checkout_failures += 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.created += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+class PoolSizingExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+
+    def _run(self, config_name, workers, duration, write_ratio=0.5, **pool_options):
+        """Closed-loop mixed workload through a client with the given pool options"""
+        _, write_concern, read_concern, read_preference, _ = next(
+            c for c in OpenLoopExperiments.CONFIGURATIONS if c[0] == config_name)
+        listener = PoolWaitListener()
+        client = MongoClient(self.connection_string, event_listeners=[listener], **pool_options)
+        try:
+            db = client[self.db.name]
+            write_collection = db.get_collection('pool_sizing_test', write_concern=write_concern)
+            read_collection = db.get_collection(
+                'pool_sizing_test', read_concern=read_concern, read_preference=read_preference)
+            client.admin.command('ping')
+
+            operations = LatencyHistogram()
+            waits = LatencyHistogram()
+            lock = threading.Lock()
+            counters = {"ops": 0, "errors": 0}
+            start_barrier = threading.Barrier(workers + 1)
+            stop_event = threading.Event()
+            payload = "x" * 1000  # 1KB data
+
+            def loop(worker_id):
+                rng = random.Random(worker_id)
+                local_ops = LatencyHistogram()
+                local_waits = LatencyHistogram()
+                ops = errors = 0
+                start_barrier.wait()
+                while not stop_event.is_set():
+                    listener.reset_wait()
+                    start = time.perf_counter()
+                    try:
+                        if rng.random() < write_ratio:
+                            write_collection.insert_one({"worker": worker_id, "data": payload})
+                        else:
+                            read_collection.find_one({"worker": worker_id})
+                        ops += 1
+                    except PyMongoError:
+                        errors += 1
+                        continue
+                    total = (time.perf_counter() - start) * 1000
+                    wait = listener.last_wait_ms()
+                    local_waits.record(wait)
+                    local_ops.record(max(total - wait, 0.0))
+                with lock:
+                    operations.merge(local_ops)
+                    waits.merge(local_waits)
+                    counters["ops"] += ops
+                    counters["errors"] += errors
+
+            threads = [threading.Thread(target=loop, args=(w,)) for w in range(workers)]
+            for t in threads:
+                t.start()
+            start_barrier.wait()
+            started = time.perf_counter()
+            time.sleep(duration)
+            stop_event.set()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            client.close()
+
+        return {
+            "throughput": counters["ops"] / elapsed,
+            "errors": counters["errors"],
+            "operation": operations.summary(),
+            "wait": waits.summary(),
+            "connections": listener.created,
+            "checkout_failures": listener.checkout_failures,
+        }
+
+    def _print_row(self, label, result):
+        print(f"  {label:>24} {result['throughput']:>9.0f} {result['operation']['p50']:>8.2f} "
+              f"{result['operation']['p99']:>8.2f} {result['wait']['p50']:>8.2f} {result['wait']['p99']:>8.2f} "
+              f"{result['connections']:>6} {result['errors']:>7}")
+
+    def pool_sweep(self, configs=("strong", "eventual"), concurrencies=(8, 32, 128),
+                   pool_sizes=(1, 2, 4, 8, 16, 32, 64, 128), duration=3):
+        """
+        maxPoolSize x worker concurrency per configuration, then minPoolSize,
+        maxConnecting and waitQueueTimeoutMS at the highest concurrency
+        """
+        print("\n" + "-"*70)
+        print("Connection Pool Sizing")
+        print("-"*70)
+        self.db['pool_sizing_test'].drop()
+        self.db['pool_sizing_test'].create_index("worker")
+        header = (f"  {'setting':>24} {'ops/s':>9} {'op p50':>8} {'op p99':>8} {'wait p50':>8} "
+                  f"{'wait p99':>8} {'conns':>6} {'errors':>7}")
+
+        knees = {}
+        for config_name in configs:
+            for workers in concurrencies:
+                print(f"\n{'─'*70}")
+                print(f"Configuration: {config_name}, {workers} workers")
+                print(f"{'─'*70}")
+                print(header)
+                results = {}
+                for size in pool_sizes:
+                    results[size] = self._run(config_name, workers, duration, maxPoolSize=size)
+                    self._print_row(f"maxPoolSize={size}", results[size])
+                best = max(r["throughput"] for r in results.values())
+                knees[(config_name, workers)] = next(
+                    size for size in pool_sizes if results[size]["throughput"] >= 0.95 * best)
+
+        workers = concurrencies[-1]
+        size = knees[(configs[0], workers)]
+        print(f"\n{'─'*70}")
+        print(f"Pool knobs: {configs[0]}, {workers} workers, maxPoolSize={size}")
+        print(f"{'─'*70}")
+        print(header)
+        self._print_row("pymongo defaults", self._run(configs[0], workers, duration))
+        knob_settings = [
+            ("knee baseline", {}),
+            (f"minPoolSize={size}", {"minPoolSize": size}),
+            ("maxConnecting=8", {"maxConnecting": 8}),
+            ("waitQueueTimeoutMS=50", {"waitQueueTimeoutMS": 50}),
+            ("pool/4 + waitQueue 50", {"waitQueueTimeoutMS": 50, "maxPoolSize": max(1, size // 4)}),
+        ]
+        for label, options in knob_settings:
+            options = {"maxPoolSize": size, **options}
+            self._print_row(label, self._run(configs[0], workers, duration, **options))
+
+        print(f"\n Pool Size Knee (smallest maxPoolSize within 95% of best throughput):")
+        for (config_name, workers), size in knees.items():
+            print(f"   {config_name:9} {workers:>4} workers -> maxPoolSize {size}")
+        print(f"\n Notes:")
+        print(f"   op = operation latency excluding checkout wait; wait = pool checkout wait (ms)")
+        print(f"   pymongo defaults = maxPoolSize 100, minPoolSize 0, maxConnecting 2, no wait queue timeout;")
+        print(f"   the other knob rows run at maxPoolSize={size} (the knee) unless stated")
+        print(f"   pools are per member, so eventual reads also use the secondaries' pools")
+        print("="*70)
+        return knees
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Connection Pool Sizing Study")
+    print("="*70)
+
+    experiments = PoolSizingExperiments()
+
+    try:
+        experiments.pool_sweep()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
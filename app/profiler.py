@@ -0,0 +1,148 @@
+"""
+Client-side Profiling
+Opt-in sampling profiler (a thread that samples every thread's Python stack)
+plus tracemalloc snapshots, per experiment phase. Writes collapsed stacks
+(flamegraph.pl / speedscope input) and the top allocation sites to
+profiles/, and prints where client-side samples were spent.
+
+Enable with LAB_PROFILE=1 (CPU + allocations), LAB_PROFILE=cpu (sampling
+only) or `python main.py --profile`. Worker processes are not sampled.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import functools
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+# innermost Python frames that block in C (socket reads, locks, sleeps); samples ending
+# there count as waiting, the rest approximate on-CPU client work
+WAITING_FUNCTIONS = {"wait", "_wait_for_tstate_lock", "select", "receive_data",
+                     "_receive_data_on_socket", "wait_for_read", "sleep_until", "accept"}
+
+settings = {"enabled": False, "allocations": True, "output_dir": "profiles"}
+
+
+def enable(allocations=True, output_dir="profiles"):
+    settings.update(enabled=True, allocations=allocations, output_dir=output_dir)
+
+
+def enable_from_environment(argv=None):
+    """Turn profiling on from LAB_PROFILE or a --profile argument"""
+    mode = os.getenv("LAB_PROFILE", "")
+    if "--profile" in (argv or []):
+        mode = mode or "1"
+    if mode and mode != "0":
+        enable(allocations=mode != "cpu")
+    return settings["enabled"]
+
+
+def _category(filename):
+    if f"{os.sep}bson{os.sep}" in filename:
+        return "bson"
+    if f"{os.sep}pymongo{os.sep}" in filename:
+        return "pymongo"
+    if "site-packages" in filename or filename.startswith(sys.prefix) or filename.startswith("<"):
+        return "stdlib/other"
+    return "experiment code"
+
+
+class SamplingProfiler(threading.Thread):
+    """Samples the stacks of all other threads every `interval` seconds"""
+
+    def __init__(self, interval=0.005, max_depth=64):
+        super().__init__(daemon=True, name="sampling-profiler")
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stop_event = threading.Event()
+        self.stacks = Counter()
+        self.busy = Counter()
+        self.samples = 0
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                leaf = frame
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    code = frame.f_code
+                    labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+                if leaf.f_code.co_name not in WAITING_FUNCTIONS:
+                    self.busy[_category(leaf.f_code.co_filename)] += 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+@contextmanager
+def profile_phase(name, interval=0.005, top_allocations=15):
+    """Profile the enclosed block; a no-op unless profiling is enabled"""
+    if not settings["enabled"]:
+        yield
+        return
+
+    os.makedirs(settings["output_dir"], exist_ok=True)
+    prefix = os.path.join(settings["output_dir"],
+                          f"{datetime.now():%Y%m%d_%H%M%S}_{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}")
+    track_allocations = settings["allocations"] and not tracemalloc.is_tracing()
+    if track_allocations:
+        tracemalloc.start(10)
+        before = tracemalloc.take_snapshot()
+    sampler = SamplingProfiler(interval)
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+        with open(prefix + ".collapsed", "w") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        print(f"\n Profile: {name}")
+        print(f"   Wall {elapsed:.2f}s, client CPU {cpu:.2f}s ({cpu / elapsed if elapsed else 0:.0%} of one core), "
+              f"{sampler.samples} stack samples")
+        busy_total = sum(sampler.busy.values())
+        for category, count in sampler.busy.most_common():
+            print(f"   {category:16} {count / busy_total:>6.1%} of running samples")
+        print(f"   Collapsed stacks: {prefix}.collapsed")
+
+        if track_allocations:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            statistics = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+            with open(prefix + ".allocations.txt", "w") as f:
+                f.write(f"peak traced memory: {peak / 2**20:.1f} MB\n")
+                for stat in statistics[:top_allocations]:
+                    f.write(f"{stat}\n")
+            print(f"   Peak traced memory {peak / 2**20:.1f} MB, top allocation sites: "
+                  f"{prefix}.allocations.txt")
+
+
+def profiled(func):
+    """Decorator for experiment entry points: one profile phase per call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile_phase(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
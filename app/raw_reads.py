@@ -0,0 +1,169 @@
+"""
+Part D: Raw-BSON Read Mode
+Reads documents as RawBSONDocument (via document_class) so the measured
+round trip does not include decoding into Python dicts; decode time is
+measured separately
+"""
+
+from pymongo import MongoClient
+from bson import decode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+import os
+import time
+import traceback
+
+from fixtures import Fixtures
+from load_generator import LatencyHistogram
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def raw_collection(collection):
+    """Same collection (and read/write settings) returning RawBSONDocument"""
+    return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+
+
+def timed_find_one(collection, filter, projection=None, raw=False, measure_decode=True):
+    """
+    find_one that reports (document, round_trip_ms, decode_ms).
+
+    raw=True: the round trip only parses the reply envelope; decode_ms is the
+    cost of fully decoding the returned bytes, which a dict read would have
+    paid inside its round trip. The first field access on the returned
+    RawBSONDocument decodes its whole top level (see timed_field).
+    raw=False: decode is part of round_trip_ms and decode_ms is None.
+    measure_decode=False skips the extra decode (decode_ms is None).
+    """
+    if raw:
+        collection = raw_collection(collection)
+    start = time.perf_counter()
+    document = collection.find_one(filter, projection)
+    round_trip_ms = (time.perf_counter() - start) * 1000
+    decode_ms = None
+    if raw and measure_decode and document is not None:
+        start = time.perf_counter()
+        decode(document.raw)
+        decode_ms = (time.perf_counter() - start) * 1000
+    return document, round_trip_ms, decode_ms
+
+
+def timed_field(document, field):
+    """
+    (value, decode_ms) of document[field]. On a RawBSONDocument the first
+    access inflates every top-level field, not just `field`, so decode_ms is
+    a decode cost; later accesses hit the inflated dict
+    """
+    start = time.perf_counter()
+    value = document[field]
+    return value, (time.perf_counter() - start) * 1000
+
+
+def make_document(doc_id, num_fields):
+    """Profile-like document with nested sub-documents and arrays"""
+    return {
+        "_id": doc_id,
+        "user_id": doc_id,
+        "username": f"user_{doc_id}",
+        "value": doc_id * 10,
+        "history": [
+            {"event": f"event_{i}", "count": i, "tags": ["a", "b", "c"], "score": i * 0.5}
+            for i in range(num_fields)
+        ],
+    }
+
+
+class RawReadExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+        self.test_collection = self.db['raw_read_test']
+
+    def decode_benchmark(self, history_sizes=(10, 1000, 20000), num_docs=20, num_reads=200):
+        """
+        Compare dict reads with raw reads (full decode, first field access,
+        and projected) for growing document sizes, separating round trip
+        from decode time
+        """
+        print("\n" + "-"*70)
+        print("Raw-BSON Reads: Round Trip vs Decode Time")
+        print("-"*70)
+
+        modes = [
+            ("dict", None, False, None),
+            ("raw", None, True, None),
+            ("raw + 1 field", None, True, "value"),
+            ("dict projection", {"value": 1}, False, None),
+            ("raw projection", {"value": 1}, True, None),
+        ]
+
+        for size in history_sizes:
+            self.fixtures.reset('raw_read_test')
+            self.test_collection.insert_many([make_document(i, size) for i in range(num_docs)])
+            self.fixtures.settle()
+            doc_bytes = len(raw_collection(self.test_collection).find_one({"_id": 0}).raw)
+
+            print(f"\n{'─'*70}")
+            print(f"Document size: {doc_bytes / 1024:.1f} KB ({size} history entries)")
+            print(f"{'─'*70}")
+            print(f"  {'mode':16} {'round trip p50':>15} {'p99':>9} {'decode p50':>11} {'total p50':>10}")
+
+            for label, projection, raw, field in modes:
+                round_trips = LatencyHistogram()
+                decodes = LatencyHistogram()
+                totals = LatencyHistogram()
+                for i in range(num_reads):
+                    start = time.perf_counter()
+                    document, round_trip_ms, decode_ms = timed_find_one(
+                        self.test_collection, {"_id": i % num_docs}, projection,
+                        raw=raw, measure_decode=not field)
+                    if field:
+                        _, decode_ms = timed_field(document, field)
+                    totals.record((time.perf_counter() - start) * 1000)
+                    round_trips.record(round_trip_ms)
+                    if decode_ms is not None:
+                        decodes.record(decode_ms)
+                if decodes.count:
+                    decode_text = f"{decodes.percentile(50):>11.3f}"
+                else:
+                    decode_text = f"{'(in RTT)':>11}"
+                print(f"  {label:16} {round_trips.percentile(50):>15.3f} {round_trips.percentile(99):>9.3f} "
+                      f"{decode_text} {totals.percentile(50):>10.3f}")
+
+        print(f"\n Notes:")
+        print(f"   times in ms; dict reads decode inside the round trip")
+        print(f"   raw decode = cost of a full bson.decode of the returned bytes")
+        print(f"   raw + 1 field decode = first field access, which inflates the whole top level")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Raw-BSON Read Mode")
+    print("="*70)
+
+    experiments = RawReadExperiments()
+
+    try:
+        experiments.decode_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Part D: Bounded-staleness Read Cache
+LRU/TTL cache in front of user profile lookups, invalidated by a change
+stream on the collection, with a hard staleness ceiling
+"""
+
+from pymongo import MongoClient, WriteConcern
+from pymongo.read_concern import ReadConcern
+from pymongo.errors import PyMongoError
+from collections import OrderedDict
+import os
+import threading
+import time
+import traceback
+
+from contention import ZipfKeys
+from load_generator import LatencyHistogram, percentile
+
+
+class BoundedStalenessCache:
+    """
+    Caches find_one({key_field: key}) results.
+
+    An entry is served only if it is younger than `ttl` and its staleness is
+    provably below `max_staleness`: either it was fetched less than
+    max_staleness seconds ago, or the change stream was caught up less than
+    max_staleness seconds ago (so any change before that point has already
+    invalidated it). Otherwise the lookup goes to the database.
+
+    Change streams only return majority-committed changes, so documents are
+    fetched with readConcern "majority" too and the ceiling is relative to
+    the majority commit point: against the primary's latest w=1 write a
+    cached entry can additionally be behind by the majority-commit lag.
+    """
+
+    def __init__(self, collection, key_field="user_id", max_entries=10000, ttl=30.0,
+                 max_staleness=1.0):
+        self.collection = collection
+        self.reader = collection.with_options(read_concern=ReadConcern("majority"))
+        self.key_field = key_field
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (document, fetched_at)
+        self.keys_by_id = {}
+        self.invalidation_count = 0
+        self.stream_caught_up_at = None
+        self.stop_event = threading.Event()
+        self.stream_ready = threading.Event()
+        self.metrics = {"hits": 0, "misses": 0, "expired": 0, "ceiling_misses": 0,
+                        "invalidations": 0, "stream_errors": 0}
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self, timeout=10):
+        self.thread.start()
+        self.stream_ready.wait(timeout)
+        return self
+
+    def _watch(self):
+        while not self.stop_event.is_set():
+            try:
+                with self.collection.watch(max_await_time_ms=100) as stream:
+                    self.stream_ready.set()
+                    while not self.stop_event.is_set():
+                        # read timestamp before the poll: everything up to it has been seen
+                        polled_at = time.monotonic()
+                        change = stream.try_next()
+                        if change is None:
+                            with self.lock:
+                                self.stream_caught_up_at = polled_at
+                            continue
+                        self._invalidate(change)
+            except PyMongoError:
+                self.metrics["stream_errors"] += 1
+                with self.lock:
+                    # cannot vouch for cached entries while the stream is down
+                    self.stream_caught_up_at = None
+                    self.entries.clear()
+                    self.keys_by_id.clear()
+                self.stop_event.wait(0.5)
+
+    def _invalidate(self, change):
+        operation = change["operationType"]
+        with self.lock:
+            self.invalidation_count += 1
+            if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                self.entries.clear()
+                self.keys_by_id.clear()
+                return
+            key = self.keys_by_id.pop(change.get("documentKey", {}).get("_id"), None)
+            if key is None and operation == "insert":
+                key = change["fullDocument"].get(self.key_field)  # drop cached "not found"
+            if key is not None and self.entries.pop(key, None) is not None:
+                self.metrics["invalidations"] += 1
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                document, fetched_at = entry
+                age = now - fetched_at
+                stream_fresh = (self.stream_caught_up_at is not None
+                                and now - self.stream_caught_up_at <= self.max_staleness)
+                if age > self.ttl:
+                    self.metrics["expired"] += 1
+                elif age <= self.max_staleness or stream_fresh:
+                    self.entries.move_to_end(key)
+                    self.metrics["hits"] += 1
+                    return document
+                else:
+                    self.metrics["ceiling_misses"] += 1
+            self.metrics["misses"] += 1
+            invalidations_before = self.invalidation_count
+
+        fetched_at = time.monotonic()
+        document = self.reader.find_one({self.key_field: key})
+        with self.lock:
+            if self.invalidation_count != invalidations_before:
+                # a change arrived while fetching; it may predate this read, so do not cache
+                return document
+            self.entries[key] = (document, fetched_at)
+            self.entries.move_to_end(key)
+            if document is not None:
+                self.keys_by_id[document["_id"]] = key
+            while len(self.entries) > self.max_entries:
+                old_key, (old_doc, _) = self.entries.popitem(last=False)
+                if old_doc is not None:
+                    self.keys_by_id.pop(old_doc["_id"], None)
+        return document
+
+    def stream_lag(self):
+        """Seconds since the change stream was last known to be caught up"""
+        with self.lock:
+            if self.stream_caught_up_at is None:
+                return None
+            return time.monotonic() - self.stream_caught_up_at
+
+    def hit_ratio(self):
+        total = self.metrics["hits"] + self.metrics["misses"]
+        return self.metrics["hits"] / total if total else 0.0
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+class ReadCacheExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.test_collection = self.db.get_collection(
+            'user_profiles_cache_test', write_concern=WriteConcern(w=1))
+
+    def _seed_users(self, num_users):
+        self.test_collection.drop()
+        self.test_collection.create_index("user_id", unique=True)
+        self.test_collection.insert_many([
+            {"user_id": 1000 + i, "username": f"user_{i}", "version": 0, "profile": {"city": "Dublin"}}
+            for i in range(num_users)
+        ])
+
+    def _writer(self, num_users, rate, stop_event, acked):
+        """Updates random users at `rate`/s; acked[user_id] = (version, ack time)"""
+        keys = ZipfKeys(num_users, seed=7)
+        version = 0
+        while not stop_event.is_set():
+            version += 1
+            user_id = 1000 + keys.sample()
+            self.test_collection.update_one({"user_id": user_id}, {"$set": {"version": version}})
+            acked[user_id] = (version, time.monotonic())
+            stop_event.wait(1.0 / rate)
+
+    def _read_loop(self, lookup, num_users, num_reads, acked):
+        keys = ZipfKeys(num_users, seed=11)
+        histogram = LatencyHistogram()
+        staleness = []
+        for _ in range(num_reads):
+            user_id = 1000 + keys.sample()
+            latest = acked.get(user_id)
+            start = time.perf_counter()
+            document = lookup(user_id)
+            histogram.record((time.perf_counter() - start) * 1000)
+            if latest and document and document["version"] < latest[0]:
+                # stale: a newer version had been acknowledged before this read started
+                staleness.append((time.monotonic() - latest[1]) * 1000)
+        return histogram, staleness
+
+    def cache_benchmark(self, num_users=1000, num_reads=5000, write_rate=100,
+                        max_staleness=1.0, ttl=30.0):
+        """
+        Zipf-distributed profile lookups with and without the cache while a
+        writer updates profiles at `write_rate` per second
+        """
+        print("\n" + "-"*70)
+        print("Bounded-staleness Read Cache vs Direct Reads")
+        print("-"*70)
+        print(f"Users: {num_users}, reads: {num_reads}, concurrent updates: {write_rate}/s, "
+              f"staleness ceiling: {max_staleness}s, TTL: {ttl}s")
+
+        self._seed_users(num_users)
+        cache = BoundedStalenessCache(self.test_collection, max_staleness=max_staleness, ttl=ttl).start()
+
+        results = {}
+        try:
+            for label, lookup in (("uncached", lambda uid: self.test_collection.find_one({"user_id": uid})),
+                                  ("cached", cache.get)):
+                stop_event = threading.Event()
+                acked = {}
+                writer = threading.Thread(target=self._writer,
+                                          args=(num_users, write_rate, stop_event, acked), daemon=True)
+                writer.start()
+                try:
+                    results[label] = self._read_loop(lookup, num_users, num_reads, acked)
+                finally:
+                    stop_event.set()
+                    writer.join()
+        finally:
+            cache.close()
+
+        print(f"\n  {'mode':9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'stale reads':>12} "
+              f"{'p99 stale ms':>13} {'max stale ms':>13}")
+        for label, (histogram, staleness) in results.items():
+            latency = histogram.summary()
+            print(f"  {label:9} {latency['p50']:>8.3f} {latency['p95']:>8.3f} {latency['p99']:>8.3f} "
+                  f"{len(staleness):>12} {percentile(staleness, 99):>13.1f} "
+                  f"{max(staleness, default=0.0):>13.1f}")
+
+        metrics = cache.metrics
+        print(f"\n Cache Metrics:")
+        print(f"   Hit ratio: {cache.hit_ratio():.1%} ({metrics['hits']} hits, {metrics['misses']} misses)")
+        print(f"   Invalidations from change stream: {metrics['invalidations']}")
+        print(f"   Misses forced by staleness ceiling: {metrics['ceiling_misses']}, TTL expiries: {metrics['expired']}")
+        print(f"   Change stream errors: {metrics['stream_errors']}")
+        print(f"\n Notes:")
+        print(f"   the ceiling is relative to the majority commit point; staleness here is measured")
+        print(f"   against w=1 acknowledgements, so it also includes the majority-commit lag")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Bounded-staleness Read Cache")
+    print("="*70)
+
+    experiments = ReadCacheExperiments()
+
+    try:
+        experiments.cache_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,16 +9,28 @@ import os
 import traceback
 from datetime import datetime
 
+from fixtures import Fixtures
+from retry_policy import NoRetry
+from topology_watcher import TopologyWatcher
+
 class ReplicationExperiments:
-    def __init__(self):
-        """Initialize the connection"""
+    def __init__(self, retry_policy=None, db_name='lab2_distributed_db'):
+        """Initialize the connection (retry_policy wraps writes during failover)"""
         self.connection_string = os.getenv(
             'MONGO_URI',
             'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
         )
-        self.client = MongoClient(self.connection_string)
-        self.db = self.client['lab2_distributed_db']
+        # cached topology view fed by driver events (no replSetGetStatus polling)
+        self.topology = TopologyWatcher()
+        self.client = MongoClient(
+            self.connection_string,
+            event_listeners=[self.topology],
+            heartbeatFrequencyMS=500
+        )
+        self.db = self.client[db_name]
         self.test_collection = self.db['replication_test']
+        self.retry_policy = retry_policy or NoRetry()
+        self.fixtures = Fixtures(self.db)
         
     def show_replica_info(self):
         """Show the replica set information"""
@@ -27,25 +39,25 @@ class ReplicationExperiments:
         print("-"*70)
         
         try:
-            status = self.client.admin.command("replSetGetStatus") #dynamic status
             config = self.client.admin.command("replSetGetConfig") #static config
+            self.topology.wait_for_members(len(config['config']['members']))
+            members = self.topology.members() #dynamic status from driver events
             
-            print(f"\n Replica Set Name: {status['set']}")
-            print(f" Total Nodes: {len(status['members'])}")
+            print(f"\n Replica Set Name: {config['config']['_id']}")
+            print(f" Total Nodes: {len(config['config']['members'])}")
             
             # replication factor from config 
             print(f"\n Data Replication Configuration:")
             print(f" Replication Factor: {len(config['config']['members'])} (Data will be replicated to all nodes)")
             
             print(f"\nNode Details:")
-            for member in status['members']:
-                state = member['stateStr']
-                name = member['name']
-                health = '✅' if member.get('health', 0) == 1 else '❌'
-                priority = next((m['priority'] for m in config['config']['members'] 
-                               if m['host'] == name), 1)
+            for member in config['config']['members']:
+                name = member['host']
+                info = members.get(name, {"role": "Unknown", "rtt_ms": None})
+                health = '✅' if info['role'] != 'Unknown' else '❌'
+                rtt = f"{info['rtt_ms']:.2f} ms" if info['rtt_ms'] is not None else "n/a"
                 
-                print(f"  {health} {name:20} -> {state:12} (Priority: {priority})")
+                print(f"  {health} {name:20} -> {info['role']:12} (Priority: {member.get('priority', 1)}, RTT: {rtt})")
                 
         except Exception as e:
             print(f"Failed to get replica set information: {e}")
@@ -63,7 +75,8 @@ class ReplicationExperiments:
         ]
         
         for w_value, description in write_concerns:
-            self.test_collection.delete_many({})
+            self.fixtures.reset('replication_test')
+            self.fixtures.settle()
             print(f"\n{'─'*70}")
             print(f"Test Configuration: {description}")
             print(f"{'─'*70}")
@@ -119,15 +132,9 @@ class ReplicationExperiments:
             print("\n Step 1: Identify Cluster Topology")
             print("─"*70)
             
-            status = self.client.admin.command("replSetGetStatus")
-            primary = None
-            secondaries = []
-            
-            for member in status['members']:
-                if member['stateStr'] == 'PRIMARY':
-                    primary = member['name']
-                elif member['stateStr'] == 'SECONDARY':
-                    secondaries.append(member['name'])
+            primary = self.topology.wait_for_primary(timeout=10)
+            self.topology.wait_for_members(3)
+            secondaries = self.topology.secondaries()
             
             print(f"✅ Primary:      {primary}")
             print(f"✅ Secondaries:  {', '.join(secondaries)}")
@@ -135,7 +142,8 @@ class ReplicationExperiments:
             # Step 2: Write to Primary
             print(f"\n Step 2: Write and read Data against the primary")
             print("─"*70)
-            self.db.get_collection('replication_test').delete_many({})
+            self.fixtures.reset('replication_test')
+            self.fixtures.settle()
             test_doc = {
                 "test_id": f"propagation_test_{int(time.time())}",
                 "message": "Testing data propagation from Primary to Secondaries",
@@ -193,17 +201,11 @@ class ReplicationExperiments:
             print("\n Step 1: Identify Current Primary Node")
             print("─"*70)
             
-            status = self.client.admin.command("replSetGetStatus")
-            primary = None
-            for member in status['members']:
-                if member['stateStr'] == 'PRIMARY':
-                    primary = member['name']
-                    print(f"✅ Current Primary: {primary}")
-                    break
-            
+            primary = self.topology.wait_for_primary(timeout=10)
             if not primary:
                 print("❌ No primary node found!")
                 return
+            print(f"✅ Current Primary: {primary}")
             
             primary_container = primary.split(':')[0]
             
@@ -233,6 +235,7 @@ class ReplicationExperiments:
             print("─"*70)
             
             downtime_start = time.time()
+            stepdown_issued = time.monotonic()
             
             try:
                 # Use stepDown command to force primary to step down
@@ -251,6 +254,7 @@ class ReplicationExperiments:
             print(f"\n Step 4: Ongoing Operations During Failover")
             print("─"*70)
             print("Simulating real-world scenario: write operation during election")
+            print(f"Retry policy: {self.retry_policy.name}")
             print("")
             
             new_primary = None
@@ -279,7 +283,7 @@ class ReplicationExperiments:
             
             # Try to write - this will block until election completes
             try:
-                result = collection.insert_one(during_doc)
+                result = self.retry_policy.call(lambda: collection.insert_one(during_doc))
                 write_latency = (time.time() - write_start_time) * 1000
                 write_success = True
                 
@@ -290,32 +294,17 @@ class ReplicationExperiments:
                 write_latency = (time.time() - write_start_time) * 1000
                 print(f"\r [Write Status] ❌ Failed after {write_latency/1000:.1f}s")
             
-            # Check election result
-            print(f" [Election] Checking status...")
+            # Check election result: returns as soon as the driver sees the new primary
+            print(f" [Election] Waiting for the driver to discover a new primary...")
             max_wait = 30
-            check_interval = 2
-            
-            for i in range(int(max_wait / check_interval)):
-                time.sleep(check_interval)
-                try:
-                    status = self.client.admin.command("replSetGetStatus")
-                    for member in status['members']:
-                        if member['stateStr'] == 'PRIMARY':
-                            new_primary = member['name']
-                            election_time = time.time() - downtime_start
-                            break
-                    
-                    if new_primary:
-                        print(f" [Election] ✅ New Primary: {new_primary}")
-                        print(f" t={election_time:.1f}s: Election completed")
-                        break
-                    else:
-                        print(f" [t={(i+1)*check_interval}s] Election in progress...")
-                        
-                except Exception as e:
-                    print(f" [t={(i+1)*check_interval}s] Checking...")
-            
-            if not new_primary:
+            
+            new_primary, election_time = self.topology.wait_for_new_primary(
+                primary, timeout=max_wait, since=stepdown_issued
+            )
+            if new_primary:
+                print(f" [Election] ✅ New Primary: {new_primary}")
+                print(f" t={election_time:.2f}s: Election completed (driver detection time)")
+            else:
                 print(f" No new primary elected within {max_wait} seconds")
             
             # Analysis
@@ -336,15 +325,9 @@ class ReplicationExperiments:
             print("─"*70)
             
             try:
-                # Wait a moment for the system to stabilize
-                time.sleep(3)
-                
-                # Check status of the original primary
-                status = self.client.admin.command("replSetGetStatus")
-                for member in status['members']:
-                    if primary_container in member['name']:
-                        print(f"✅ Original primary ({primary_container}) is now: {member['stateStr']}")
-                        break
+                # Check status of the original primary from the cached topology
+                original = self.topology.members().get(primary, {"role": "Unknown"})
+                print(f"✅ Original primary ({primary_container}) is now: {original['role']}")
             except Exception as e:
                 print(f"⚠️  Error checking status: {e}")
             
@@ -359,6 +342,7 @@ class ReplicationExperiments:
     
     def close(self):
         if self.client:
+            self.fixtures.close()
             self.client.close()
 
 
@@ -0,0 +1,323 @@
+"""
+Part D: Client-side Retry Policies for Election Windows
+Pluggable retry policies (backoff with jitter, deadline budgets, hedged
+retry, circuit breaker) around experiment reads/writes, and a benchmark that
+compares them through repeated stepdowns
+"""
+
+from pymongo import MongoClient, WriteConcern
+from pymongo.errors import AutoReconnect, ConnectionFailure, NotPrimaryError
+from concurrent.futures import CancelledError, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import os
+import random
+import threading
+import time
+import traceback
+
+from fixtures import Fixtures
+from load_generator import LatencyHistogram
+from topology_watcher import TopologyWatcher
+
+# errors raised while the replica set has no (reachable) primary
+RETRYABLE_ERRORS = (AutoReconnect, NotPrimaryError)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the database while the circuit breaker is open"""
+
+
+class NoRetry:
+    """Single attempt; relies only on the driver's own retryWrites/retryReads"""
+
+    name = "no-retry"
+
+    def call(self, operation, idempotent=False):
+        return operation()
+
+    def close(self):
+        pass
+
+
+class ExponentialBackoff:
+    """
+    Retry retryable errors with full-jitter exponential backoff until
+    max_attempts or the deadline budget (seconds) is used up
+    """
+
+    def __init__(self, base_delay=0.05, max_delay=2.0, max_attempts=10, deadline=15.0, seed=None):
+        self.name = f"backoff({base_delay * 1000:.0f}ms, deadline {deadline:.0f}s)"
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.random = random.Random(seed)
+
+    def call(self, operation, idempotent=False):
+        give_up_at = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            try:
+                return operation()
+            except RETRYABLE_ERRORS:
+                delay = self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if attempt == self.max_attempts - 1 or time.monotonic() + delay >= give_up_at:
+                    raise
+                time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+class HedgedRetry:
+    """
+    Start a second attempt if the first has not finished after hedge_delay
+    and return whichever succeeds first. Only calls made with
+    idempotent=True (reads) are hedged; two racing upserts can still fail
+    with DuplicateKeyError, so everything else gets a single attempt with
+    backoff. The losing attempt stops retrying once the call returns.
+    """
+
+    def __init__(self, hedge_delay=0.5, deadline=15.0, max_workers=64):
+        self.name = f"hedged({hedge_delay * 1000:.0f}ms)"
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.backoff = ExponentialBackoff(deadline=deadline)
+
+    def call(self, operation, idempotent=False):
+        if not idempotent:
+            return self.backoff.call(operation)
+        give_up_at = time.monotonic() + self.deadline
+        finished = threading.Event()
+
+        def guarded():
+            if finished.is_set():
+                raise CancelledError()  # not retryable: ends the loser's backoff loop
+            return operation()
+
+        attempt = lambda: self.backoff.call(guarded)
+        pending = {self.pool.submit(attempt)}
+        try:
+            done, pending = wait(pending, timeout=self.hedge_delay)
+            if not done:
+                pending.add(self.pool.submit(attempt))
+            error = None
+            while True:
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+                if not pending:
+                    raise error
+                done, pending = wait(pending, timeout=max(0.0, give_up_at - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError("hedged operation exceeded its deadline")
+        finally:
+            finished.set()
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class CircuitBreaker:
+    """
+    Wraps another policy. After `failure_threshold` consecutive retryable
+    failures the circuit opens and calls fail fast with CircuitOpenError for
+    `reset_timeout` seconds; then one trial call is let through (half-open).
+    Non-retryable errors mean the primary answered, so they close the circuit.
+    """
+
+    def __init__(self, inner, failure_threshold=5, reset_timeout=2.0):
+        self.name = f"breaker({inner.name})"
+        self.inner = inner
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def call(self, operation, idempotent=False):
+        trial = False
+        with self.lock:
+            if self.opened_at is not None:
+                if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                    raise CircuitOpenError("circuit open: primary unavailable")
+                self.trial_in_flight = trial = True
+        try:
+            result = self.inner.call(operation, idempotent)
+        except RETRYABLE_ERRORS + (TimeoutError,):
+            # primary unreachable (or hedged deadline exceeded): count towards opening
+            with self.lock:
+                self.failures += 1
+                if self.failures >= self.failure_threshold or self.opened_at is not None:
+                    self.opened_at = time.monotonic()
+            raise
+        except Exception:
+            # the server answered (duplicate key, write concern error, ...): it is
+            # reachable, so the circuit closes and the error goes to the caller
+            self._reset()
+            raise
+        else:
+            self._reset()
+            return result
+        finally:
+            if trial:
+                with self.lock:
+                    self.trial_in_flight = False
+
+    def close(self):
+        self.inner.close()
+
+    def _reset(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+
+def default_policies():
+    return [
+        NoRetry(),
+        ExponentialBackoff(base_delay=0.05, deadline=15.0),
+        ExponentialBackoff(base_delay=0.2, deadline=5.0),
+        HedgedRetry(hedge_delay=0.5),
+        CircuitBreaker(ExponentialBackoff(base_delay=0.05, deadline=5.0)),
+    ]
+
+
+class RetryPolicyExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.topology = TopologyWatcher()
+        # short server selection so the application policy, not the driver, decides
+        self.client = MongoClient(
+            self.connection_string,
+            serverSelectionTimeoutMS=1000,
+            event_listeners=[self.topology],
+            heartbeatFrequencyMS=500
+        )
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+
+    def _stepdown(self, stepdown_secs):
+        try:
+            self.client.admin.command('replSetStepDown', stepdown_secs,
+                                      secondaryCatchUpPeriodSecs=5)
+        except ConnectionFailure:
+            pass
+
+    def _run_policy(self, policy, workers, cycles, interval, stepdown_secs):
+        collection = self.db.get_collection(
+            'retry_policy_test',
+            write_concern=WriteConcern(w="majority", wtimeout=5000)
+        )
+        histogram = LatencyHistogram()
+        counters = {"ok": 0, "failed": 0, "fast_failed": 0}
+        lock = threading.Lock()
+        stop_event = threading.Event()
+
+        def worker(worker_id):
+            local = LatencyHistogram()
+            ok = failed = fast_failed = 0
+            n = 0
+            while not stop_event.is_set():
+                n += 1
+                key = f"{worker_id}_{n % 100}"
+                if n % 2:
+                    operation = lambda key=key, n=n: collection.replace_one(
+                        {"_id": key}, {"_id": key, "n": n}, upsert=True)
+                else:
+                    operation = lambda key=key: collection.find_one({"_id": key})
+                start = time.perf_counter()
+                try:
+                    policy.call(operation, idempotent=not n % 2)  # only reads may be hedged
+                    local.record((time.perf_counter() - start) * 1000)
+                    ok += 1
+                except CircuitOpenError:
+                    fast_failed += 1
+                    time.sleep(0.01)
+                except Exception:
+                    failed += 1
+            with lock:
+                histogram.merge(local)
+                counters["ok"] += ok
+                counters["failed"] += failed
+                counters["fast_failed"] += fast_failed
+
+        threads = [threading.Thread(target=worker, args=(w,), daemon=True) for w in range(workers)]
+        for t in threads:
+            t.start()
+        try:
+            for cycle in range(cycles):
+                time.sleep(interval / 2)
+                primary = self.topology.wait_for_primary(timeout=60)
+                self._stepdown(stepdown_secs)
+                self.topology.wait_for_new_primary(primary, timeout=60)
+                time.sleep(interval / 2)
+        finally:
+            stop_event.set()
+            for t in threads:
+                t.join()
+        return histogram, counters
+
+    def policy_benchmark(self, policies=None, workers=8, cycles=3, interval=20, stepdown_secs=15):
+        """
+        Run the same idempotent upsert/read workload under each retry policy
+        through `cycles` stepdowns and compare success rate and tail latency
+        """
+        print("\n" + "-"*70)
+        print("Retry Policy Benchmark (Repeated Stepdowns)")
+        print("-"*70)
+        print(f"Workers: {workers}, stepdowns per policy: {cycles}, interval: {interval}s")
+
+        policies = policies or default_policies()
+        print(f"\n  {'policy':38} {'success':>8} {'p50 ms':>8} {'p99 ms':>9} {'max ms':>9} {'fast-fail':>10}")
+        for policy in policies:
+            self.fixtures.reset('retry_policy_test')
+            self.fixtures.settle()
+            try:
+                histogram, counters = self._run_policy(policy, workers, cycles, interval, stepdown_secs)
+            finally:
+                policy.close()
+            attempted = counters["ok"] + counters["failed"] + counters["fast_failed"]
+            success = counters["ok"] / attempted * 100 if attempted else 0.0
+            latency = histogram.summary()
+            print(f"  {policy.name:38} {success:>7.2f}% {latency['p50']:>8.2f} {latency['p99']:>9.2f} "
+                  f"{latency['max']:>9.1f} {counters['fast_failed']:>10}")
+
+        print(f"\n Notes:")
+        print(f"   latency percentiles cover successful operations only")
+        print(f"   fast-fail = calls rejected by an open circuit without touching the database")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Client-side Retry Policies")
+    print("="*70)
+
+    experiments = RetryPolicyExperiments()
+
+    try:
+        experiments.policy_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
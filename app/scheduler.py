@@ -0,0 +1,148 @@
+"""
+Experiment Scheduler
+Runs a suite of experiments unattended. Each experiment runs in its own
+process against its own per-run database, so experiments that share
+collection names (replication_test, consistency_test, ...) cannot clear
+each other's data. Experiments that only check data run concurrently;
+disruptive ones (stepdown / failover) and ones whose results are timings
+(write concern latency, model comparison, causal writer throughput) each
+get an exclusive phase afterwards, so other experiments' load is not
+measured.
+
+    python scheduler.py [B|C|all] [parallelism]
+"""
+
+from pymongo import MongoClient
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+import importlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+# module / class are imported in the worker process; the class takes db_name=
+# exclusive: runs alone (disruptive, or its results are timings)
+Task = namedtuple('Task', 'name module cls method exclusive')
+
+SUITES = {
+    "B": [
+        Task("write_concerns", "replication", "ReplicationExperiments", "write_concerns", True),
+        Task("data_propagation", "replication", "ReplicationExperiments", "data_propagation_test", False),
+        Task("leader_failover", "replication", "ReplicationExperiments", "leader_failover", True),
+    ],
+    "C": [
+        Task("strong", "consistency", "ConsistencyExperiments", "experiment_1_strong_consistency", False),
+        Task("eventual", "consistency", "ConsistencyExperiments", "experiment_2_eventual_consistency", False),
+        Task("comparison", "consistency", "ConsistencyExperiments", "experiment_3_consistency_comparison", True),
+        Task("causal", "consistency", "ConsistencyExperiments", "experiment_4_causal_consistency", True),
+    ],
+}
+SUITES["all"] = SUITES["B"] + SUITES["C"]
+
+
+def _run_task(task, db_name):
+    """Worker process body: run one experiment method, capturing its output"""
+    output = io.StringIO()
+    start = time.perf_counter()
+    error = None
+    with redirect_stdout(output):
+        try:
+            experiments = getattr(importlib.import_module(task.module), task.cls)(db_name=db_name)
+            try:
+                getattr(experiments, task.method)()
+            finally:
+                experiments.close()
+        except Exception:
+            error = traceback.format_exc()
+    return {"output": output.getvalue(), "elapsed": time.perf_counter() - start, "error": error}
+
+
+class ExperimentScheduler:
+    def __init__(self, parallelism=4, keep_databases=False):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.parallelism = parallelism
+        self.keep_databases = keep_databases
+        self.run_id = datetime.now().strftime("%m%d%H%M%S")
+
+    def db_name(self, task):
+        return f"lab2_{self.run_id}_{task.name}"[:63]
+
+    def plan(self, tasks):
+        """[(phase label, [tasks])]: one concurrent phase, then one phase per exclusive task"""
+        concurrent = [t for t in tasks if not t.exclusive]
+        phases = [("concurrent", concurrent)] if concurrent else []
+        phases += [(f"exclusive: {t.name}", [t]) for t in tasks if t.exclusive]
+        return phases
+
+    def run(self, tasks):
+        phases = self.plan(tasks)
+        print(f"Run {self.run_id}: {len(tasks)} experiments in {len(phases)} phases, "
+              f"up to {self.parallelism} concurrently")
+        results = {}
+        start = time.perf_counter()
+        # spawn: MongoClient is not fork-safe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.parallelism, mp_context=context) as pool:
+            for label, phase_tasks in phases:
+                print(f"\n▶ Phase {label}: {', '.join(t.name for t in phase_tasks)}")
+                futures = {t: pool.submit(_run_task, t, self.db_name(t)) for t in phase_tasks}
+                for task, future in futures.items():
+                    try:
+                        results[task] = future.result()
+                    except Exception as e:
+                        results[task] = {"output": "", "elapsed": 0.0, "error": f"{type(e).__name__}: {e}"}
+                    status = "✅" if not results[task]["error"] else "❌"
+                    print(f"   {status} {task.name} ({results[task]['elapsed']:.1f}s)")
+        wall = time.perf_counter() - start
+
+        for task in tasks:
+            print(f"\n{'='*70}\n {task.name} [{self.db_name(task)}]\n{'='*70}")
+            print(results[task]["output"].rstrip())
+            if results[task]["error"]:
+                print(results[task]["error"])
+
+        sequential = sum(r["elapsed"] for r in results.values())
+        print(f"\n Suite Summary:")
+        print(f"   {'experiment':18} {'database':32} {'seconds':>8} {'status':>7}")
+        for task in tasks:
+            result = results[task]
+            print(f"   {task.name:18} {self.db_name(task):32} {result['elapsed']:>8.1f} "
+                  f"{'failed' if result['error'] else 'ok':>7}")
+        print(f"   Wall time: {wall:.1f}s (sum of experiment times: {sequential:.1f}s)")
+        print(f"   Experiments in the concurrent phase share the cluster; timed ones ran in exclusive phases")
+
+        if not self.keep_databases:
+            self.drop_databases(tasks)
+        return results
+
+    def drop_databases(self, tasks):
+        client = MongoClient(self.connection_string)
+        try:
+            for task in tasks:
+                client.drop_database(self.db_name(task))
+        finally:
+            client.close()
+
+
+def main():
+    suite = sys.argv[1] if len(sys.argv) > 1 else "all"
+    parallelism = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print("="*70)
+    print(f"Experiment Scheduler: suite {suite}")
+    print("="*70)
+    try:
+        ExperimentScheduler(parallelism).run(SUITES[suite])
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Part D: Sharded-cluster Experiments
+Runs the consistency and write-concern experiments through mongos on a
+collection sharded by user_id, and compares targeted with scatter-gather
+reads, majority-write cost per shard and cross-shard transaction overhead.
+Needs the optional topology from docker-compose.sharded.yml.
+"""
+
+from pymongo import MongoClient, WriteConcern, ReadPreference
+from pymongo.read_concern import ReadConcern
+from pymongo.errors import OperationFailure
+import os
+import time
+import traceback
+from datetime import datetime
+
+from load_generator import LatencyHistogram
+
+
+class ShardingExperiments:
+    def __init__(self, num_users=20000):
+        self.connection_string = os.getenv('MONGOS_URI', 'mongodb://mongos:27017')
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_sharded_db']
+        self.users_collection = self.db['user_profiles']
+        self.num_users = num_users
+        self.split_point = num_users // 2
+        self.shards = []
+
+    def setup_sharded_collection(self):
+        """Shard user_profiles on user_id, split in the middle and put each half on its own shard"""
+        print("\n" + "-"*70)
+        print("Sharded Collection Setup")
+        print("-"*70)
+
+        self.shards = [s['_id'] for s in self.client.admin.command('listShards')['shards']]
+        print(f"✅ Shards: {', '.join(self.shards)}")
+        if len(self.shards) < 2:
+            raise RuntimeError("At least two shards are required")
+
+        # Drop the whole database so enableSharding can pin its primary shard
+        self.client.drop_database(self.db.name)
+        self.client.admin.command('enableSharding', self.db.name, primaryShard=self.shards[0])
+        self.client.admin.command('shardCollection', self.users_collection.full_name,
+                                  key={'user_id': 1})
+        self.client.admin.command('split', self.users_collection.full_name,
+                                  middle={'user_id': self.split_point})
+        for user_id, shard in ((0, self.shards[0]), (self.split_point, self.shards[1])):
+            if self._chunk_shard(user_id) != shard:
+                self.client.admin.command('moveChunk', self.users_collection.full_name,
+                                          find={'user_id': user_id}, to=shard, _waitForDelete=True)
+        layout = [(c['min']['user_id'], c['max']['user_id'], c['shard']) for c in self._chunks()]
+        if (len(layout) != 2 or layout[0][1] != self.split_point or layout[0][2] != self.shards[0]
+                or layout[1][0] != self.split_point or layout[1][2] != self.shards[1]):
+            raise RuntimeError(f"Unexpected chunk layout, expected user_id < {self.split_point} on "
+                               f"{self.shards[0]} and the rest on {self.shards[1]}: {layout}")
+
+        batch = 1000
+        for start in range(0, self.num_users, batch):
+            self.users_collection.insert_many([
+                {
+                    "user_id": user_id,
+                    "username": f"user_{user_id}",
+                    "email": f"user_{user_id}@example.com",
+                    "last_login_time": datetime.now(),
+                    "profile": {"city": "Dublin", "age": 20 + user_id % 50},
+                    "balance": 100
+                }
+                for user_id in range(start, min(start + batch, self.num_users))
+            ])
+        self.users_collection.create_index("username")
+        print(f"✅ Inserted {self.num_users} users, shard key {{user_id: 1}}, "
+              f"user_id < {self.split_point} on {self.shards[0]}, rest on {self.shards[1]}")
+
+    def _chunks(self):
+        """user_profiles chunks from config.chunks in shard key order (keyed by uuid since 5.0)"""
+        config = self.client['config']
+        namespace = self.users_collection.full_name
+        collection = config['collections'].find_one({'_id': namespace}) or {}
+        query = {'uuid': collection['uuid']} if 'uuid' in collection else {'ns': namespace}
+        return list(config['chunks'].find(query).sort('min.user_id', 1))
+
+    def _chunk_shard(self, user_id):
+        """Shard owning the chunk that contains user_id"""
+        for chunk in self._chunks():
+            if chunk['min']['user_id'] <= user_id < chunk['max']['user_id']:
+                return chunk['shard']
+        return None
+
+    def _shards_targeted(self, filter):
+        """Number of shards mongos sends the query to, from explain"""
+        explain = self.db.command('explain', {'find': self.users_collection.name, 'filter': filter},
+                                  verbosity='queryPlanner')
+        return len(explain['queryPlanner']['winningPlan'].get('shards', [None]))
+
+    def targeted_vs_scatter(self, num_reads=200):
+        """Reads with the shard key go to one shard; reads on other fields go to all of them"""
+        print("\n" + "-"*70)
+        print("Targeted vs Scatter-gather Reads")
+        print("-"*70)
+
+        queries = [
+            ("targeted (user_id)", lambda i: {"user_id": (i * 97) % self.num_users}),
+            ("scatter (username)", lambda i: {"username": f"user_{(i * 97) % self.num_users}"}),
+            ("scatter (city)", lambda i: {"profile.city": "Dublin", "profile.age": 20 + i % 50}),
+        ]
+        print(f"  {'query':22} {'shards':>7} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, make_filter in queries:
+            shards = self._shards_targeted(make_filter(0))
+            histogram = LatencyHistogram()
+            for i in range(num_reads):
+                start = time.perf_counter()
+                self.users_collection.find_one(make_filter(i))
+                histogram.record((time.perf_counter() - start) * 1000)
+            print(f"  {label:22} {shards:>7} {histogram.percentile(50):>8.2f} {histogram.percentile(99):>8.2f}")
+
+    def write_concern_per_shard(self, num_writes=50):
+        """Update documents in each shard's key range with the replication.py write concerns"""
+        print("\n" + "-"*70)
+        print("Write Concern Cost per Shard (through mongos)")
+        print("-"*70)
+
+        ranges = [(self.shards[0], 0), (self.shards[1], self.split_point)]
+        print(f"  {'write concern':14} {'shard':10} {'p50 ms':>8} {'p99 ms':>8}")
+        for w_value in (1, "majority", 3):
+            collection = self.db.get_collection(
+                'user_profiles',
+                write_concern=WriteConcern(w=w_value, j=True, wtimeout=5000)
+            )
+            for shard, base in ranges:
+                histogram = LatencyHistogram()
+                for i in range(num_writes):
+                    user_id = base + (i * 13) % self.split_point
+                    start = time.perf_counter()
+                    collection.update_one({"user_id": user_id},
+                                          {"$set": {"last_login_time": datetime.now()}})
+                    histogram.record((time.perf_counter() - start) * 1000)
+                print(f"  w={str(w_value):12} {shard:10} {histogram.percentile(50):>8.2f} "
+                      f"{histogram.percentile(99):>8.2f}")
+
+    def _transfer(self, session, collection, source, target):
+        collection.update_one({"user_id": source}, {"$inc": {"balance": -1}}, session=session)
+        collection.update_one({"user_id": target}, {"$inc": {"balance": 1}}, session=session)
+
+    def cross_shard_transactions(self, num_transactions=50):
+        """Two-document transfers: no transaction vs single-shard vs cross-shard transaction"""
+        print("\n" + "-"*70)
+        print("Cross-shard Transaction Overhead")
+        print("-"*70)
+
+        collection = self.db.get_collection(
+            'user_profiles',
+            write_concern=WriteConcern(w="majority"),
+            read_concern=ReadConcern("snapshot")
+        )
+        scenarios = [
+            ("no transaction", False, 0),
+            ("single-shard txn", True, 0),
+            ("cross-shard txn", True, self.split_point),
+        ]
+        print(f"  {'scenario':18} {'p50 ms':>8} {'p99 ms':>8} {'aborted':>8}")
+        for label, use_transaction, target_base in scenarios:
+            histogram = LatencyHistogram()
+            aborted = 0
+            for i in range(num_transactions):
+                source = (i * 7) % self.split_point
+                target = target_base + (i * 11 + 1) % self.split_point
+                start = time.perf_counter()
+                try:
+                    with self.client.start_session() as session:
+                        if use_transaction:
+                            session.with_transaction(
+                                lambda s: self._transfer(s, collection, source, target))
+                        else:
+                            self._transfer(session, collection, source, target)
+                    histogram.record((time.perf_counter() - start) * 1000)
+                except OperationFailure:
+                    aborted += 1
+            print(f"  {label:18} {histogram.percentile(50):>8.2f} {histogram.percentile(99):>8.2f} {aborted:>8}")
+
+    def consistency_through_mongos(self, num_ops=50):
+        """Strong (majority/majority) vs eventual (w=1/secondaryPreferred) on the sharded collection"""
+        print("\n" + "-"*70)
+        print("Strong vs Eventual Consistency through mongos")
+        print("-"*70)
+
+        configurations = [
+            ("strong", WriteConcern(w="majority", wtimeout=5000), ReadConcern("majority"),
+             ReadPreference.PRIMARY),
+            ("eventual", WriteConcern(w=1), ReadConcern("local"), ReadPreference.SECONDARY_PREFERRED),
+        ]
+        print(f"  {'model':9} {'write p50':>10} {'read p50':>9} {'stale reads':>12}")
+        for name, write_concern, read_concern, read_preference in configurations:
+            write_collection = self.db.get_collection('user_profiles', write_concern=write_concern)
+            read_collection = self.db.get_collection(
+                'user_profiles', read_concern=read_concern, read_preference=read_preference)
+            writes = LatencyHistogram()
+            reads = LatencyHistogram()
+            stale = 0
+            for i in range(num_ops):
+                user_id = (i * 389) % self.num_users  # spread across both shards
+                marker = f"{name}_{i}_{time.time()}"
+                start = time.perf_counter()
+                write_collection.update_one({"user_id": user_id}, {"$set": {"marker": marker}})
+                writes.record((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                doc = read_collection.find_one({"user_id": user_id})
+                reads.record((time.perf_counter() - start) * 1000)
+                if not doc or doc.get("marker") != marker:
+                    stale += 1
+            print(f"  {name:9} {writes.percentile(50):>10.2f} {reads.percentile(50):>9.2f} "
+                  f"{stale:>12}")
+
+    def run_all(self):
+        self.setup_sharded_collection()
+        self.targeted_vs_scatter()
+        self.write_concern_per_shard()
+        self.consistency_through_mongos()
+        self.cross_shard_transactions()
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Sharded-cluster Experiments")
+    print("="*70)
+
+    experiments = ShardingExperiments()
+
+    try:
+        experiments.run_all()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Event-driven Topology Watcher
+Keeps a cached view of replica set members, roles and RTTs from the driver's
+SDAM (server discovery and monitoring) events instead of polling
+replSetGetStatus
+"""
+
+from pymongo import monitoring
+from pymongo.server_type import SERVER_TYPE
+import threading
+import time
+
+
+class TopologyWatcher(monitoring.TopologyListener, monitoring.ServerListener,
+                      monitoring.ServerHeartbeatListener):
+    """
+    Register with MongoClient(..., event_listeners=[watcher]). The driver
+    calls the listener methods from its monitor threads; readers use
+    `primary`, `members()` or the wait_* methods.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.set_name = None
+        self.primary = None
+        self.roles = {}
+        self.rtts = {}
+        self.election_id = None
+        self.primary_changes = []  # (monotonic time, old primary, new primary)
+
+    # --- SDAM listener callbacks -------------------------------------------
+    #
+    # pymongo queues description_changed events and publishes them from a
+    # periodic executor (once per second), so roles and the primary come from
+    # the heartbeat replies, which are delivered synchronously on the monitor
+    # threads. Description events only add/remove members and provide RTTs.
+
+    def opened(self, event):
+        pass
+
+    def closed(self, event):
+        pass
+
+    def description_changed(self, event):
+        description = event.new_description
+        if isinstance(event, monitoring.TopologyDescriptionChangedEvent):
+            self._update_members(description)
+        else:
+            with self.condition:
+                address = self._name(description.address)
+                if description.round_trip_time is not None:
+                    self.rtts[address] = description.round_trip_time * 1000
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        address = self._name(event.connection_id)
+        reply = event.reply
+        with self.condition:
+            self.roles[address] = SERVER_TYPE._fields[reply.server_type]
+            if reply.replica_set_name:
+                self.set_name = reply.replica_set_name
+            # awaited (streaming) heartbeats block for ~heartbeatFrequencyMS, so
+            # only polling heartbeats measure a round trip
+            if not event.awaited:
+                self.rtts[address] = event.duration * 1000
+            if reply.is_writable:
+                # a deposed primary can still claim the role until it learns of
+                # the new term; only accept the newest election
+                if self.election_id is None or reply.election_id is None or reply.election_id >= self.election_id:
+                    self.election_id = reply.election_id or self.election_id
+                    self._set_primary(address)
+                else:
+                    self.roles[address] = "Unknown"  # stale primary, as the driver treats it
+            elif address == self.primary:
+                self._set_primary(None)
+            self.condition.notify_all()
+
+    def failed(self, event):
+        address = self._name(event.connection_id)
+        with self.condition:
+            self.roles[address] = "Unknown"
+            self.rtts.pop(address, None)
+            if address == self.primary:
+                self._set_primary(None)
+            self.condition.notify_all()
+
+    def _set_primary(self, primary):
+        if primary != self.primary:
+            self.primary_changes.append((time.monotonic(), self.primary, primary))
+            self.primary = primary
+
+    def _update_members(self, description):
+        names = {self._name(address) for address in description.server_descriptions()}
+        with self.condition:
+            for name in names:
+                self.roles.setdefault(name, "Unknown")
+            for name in list(self.roles):
+                if name not in names:
+                    del self.roles[name]
+                    self.rtts.pop(name, None)
+                    if name == self.primary:
+                        self._set_primary(None)
+            self.condition.notify_all()
+
+    @staticmethod
+    def _name(address):
+        return f"{address[0]}:{address[1]}"
+
+    # --- Cached view ---------------------------------------------------------
+
+    def members(self):
+        """{name: {"role": ..., "rtt_ms": ...}} as last seen by the driver"""
+        with self.condition:
+            return {name: {"role": role, "rtt_ms": self.rtts.get(name)}
+                    for name, role in sorted(self.roles.items())}
+
+    def secondaries(self):
+        with self.condition:
+            return sorted(name for name, role in self.roles.items() if role == "RSSecondary")
+
+    def wait_until(self, predicate, timeout):
+        """Block until predicate(primary) is true; returns the primary or None on timeout"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while not (self.primary and predicate(self.primary)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.primary
+
+    def wait_for_members(self, count, timeout=5):
+        """Block until `count` members have a known role; returns True if they do"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while sum(1 for role in self.roles.values() if role != "Unknown") < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def wait_for_primary(self, timeout=30):
+        return self.wait_until(lambda primary: True, timeout)
+
+    def wait_for_new_primary(self, previous, timeout=30, since=None):
+        """
+        Wait until the driver sees a primary other than `previous`.
+        Returns (new_primary, detection_seconds) where detection time is
+        measured from `since` (a time.monotonic() value, e.g. when the
+        stepdown was issued), or (None, None) on timeout.
+        """
+        since = time.monotonic() if since is None else since
+        new_primary = self.wait_until(lambda primary: primary != previous, timeout)
+        if new_primary is None:
+            return None, None
+        with self.condition:
+            detected_at = next((t for t, _, new in reversed(self.primary_changes)
+                                if new == new_primary), time.monotonic())
+        return new_primary, max(0.0, detected_at - since)
@@ -0,0 +1,236 @@
+"""
+Part D: Time-window Write Coalescer
+Collects individual writes into bulk_write batches that are flushed on max
+batch size or max linger time (like Kafka's linger.ms). Every write gets its
+own Future, so callers still see their own result or error.
+"""
+
+from pymongo import MongoClient, WriteConcern, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, WriteConcernError
+from bson import ObjectId
+from concurrent.futures import Future
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from fixtures import Fixtures
+from load_generator import LatencyHistogram
+
+
+class WriteCoalescer:
+    """
+    Usage:
+        coalescer = WriteCoalescer(collection, max_batch=100, linger_ms=5)
+        future = coalescer.insert_one(doc)
+        inserted_id = future.result()
+        coalescer.close()
+
+    Batches are sent with ordered=False, so one failed write does not stop
+    the others; its error is set on that write's future only.
+    """
+
+    def __init__(self, collection, max_batch=100, linger_ms=5):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000
+        self.condition = threading.Condition()
+        self.queue = []
+        self.closed = False
+        self.batches = 0
+        self.writes = 0
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+
+    def insert_one(self, document):
+        """Future resolves to the inserted _id"""
+        document.setdefault("_id", ObjectId())
+        return self._submit(InsertOne(document), document["_id"])
+
+    def update_one(self, filter, update, upsert=False):
+        """Future resolves to the upserted _id, or None if an existing document matched"""
+        return self._submit(UpdateOne(filter, update, upsert=upsert), None)
+
+    def _submit(self, request, result):
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("WriteCoalescer is closed")
+            self.queue.append((request, result, future, time.monotonic()))
+            if len(self.queue) == 1 or len(self.queue) >= self.max_batch:
+                self.condition.notify()
+        return future
+
+    def _flush_loop(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue and self.closed:
+                    return
+                # linger.ms semantics: the window starts when the oldest queued
+                # write arrived, not when this thread got back to the queue
+                deadline = self.queue[0][3] + self.linger
+                while len(self.queue) < self.max_batch and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = [entry[:3] for entry in self.queue[:self.max_batch]]
+                del self.queue[:self.max_batch]
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        self.batches += 1
+        self.writes += len(batch)
+        try:
+            result = self.collection.bulk_write([request for request, _, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            failed = {}
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = OperationFailure(error.get("errmsg"), error.get("code"), error)
+            concern_errors = e.details.get("writeConcernErrors", [])
+            for index, (_, value, future) in enumerate(batch):
+                if index in failed:
+                    future.set_exception(failed[index])
+                elif concern_errors:
+                    first = concern_errors[0]
+                    future.set_exception(WriteConcernError(first.get("errmsg"), first.get("code"), first))
+                else:
+                    upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+                    future.set_result(upserted.get(index, value))
+            return
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        upserted = result.upserted_ids or {}
+        for index, (_, value, future) in enumerate(batch):
+            future.set_result(upserted.get(index, value))
+
+    def average_batch(self):
+        return self.writes / self.batches if self.batches else 0.0
+
+    def close(self):
+        """Flush everything still queued and stop the background thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+
+class WriteCoalescerExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string, maxPoolSize=200)
+        self.db = self.client['lab2_distributed_db']
+        self.fixtures = Fixtures(self.db)
+        self.test_collection = self.db['coalescer_test']
+
+    def _run(self, collection, linger_ms, max_batch, producers, duration):
+        """producers closed-loop threads; linger_ms=None writes with insert_one directly"""
+        coalescer = None if linger_ms is None else WriteCoalescer(collection, max_batch, linger_ms)
+        histogram = LatencyHistogram()
+        lock = threading.Lock()
+        totals = {"ok": 0, "errors": 0}
+
+        def producer(producer_id, deadline):
+            local = LatencyHistogram()
+            ok = errors = 0
+            i = 0
+            while time.perf_counter() < deadline:
+                doc = {
+                    "test_id": f"coalescer_{producer_id}_{i}",
+                    "timestamp": datetime.now(),
+                    "data": "x" * 200
+                }
+                i += 1
+                start = time.perf_counter()
+                try:
+                    if coalescer:
+                        coalescer.insert_one(doc).result()
+                    else:
+                        collection.insert_one(doc)
+                    local.record((time.perf_counter() - start) * 1000)
+                    ok += 1
+                except Exception:
+                    errors += 1
+            with lock:
+                histogram.merge(local)
+                totals["ok"] += ok
+                totals["errors"] += errors
+
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=producer, args=(p, deadline)) for p in range(producers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        average_batch = 1.0
+        if coalescer:
+            coalescer.close()
+            average_batch = coalescer.average_batch()
+        return histogram, totals, average_batch
+
+    def linger_benchmark(self, linger_settings=(None, 0, 1, 5, 20), write_concerns=(1, "majority"),
+                         max_batch=500, producers=64, duration=10):
+        """
+        Compare throughput and per-write latency of direct insert_one against
+        the coalescer at several linger times, for each write concern
+        """
+        print("\n" + "-"*70)
+        print("Write Coalescer: Linger vs Throughput/Latency")
+        print("-"*70)
+        print(f"Producers: {producers}, max batch: {max_batch}, duration: {duration}s")
+
+        for w_value in write_concerns:
+            print(f"\n{'─'*70}")
+            print(f"Test Configuration: w={w_value}")
+            print(f"{'─'*70}")
+            print(f"  {'mode':16} {'writes/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10} {'errors':>7}")
+
+            collection = self.db.get_collection(
+                'coalescer_test',
+                write_concern=WriteConcern(w=w_value, wtimeout=5000)
+            )
+            for linger_ms in linger_settings:
+                self.fixtures.reset('coalescer_test')
+                self.fixtures.settle()
+                histogram, totals, average_batch = self._run(
+                    collection, linger_ms, max_batch, producers, duration)
+                latency = histogram.summary()
+                mode = "insert_one" if linger_ms is None else f"linger {linger_ms} ms"
+                print(f"  {mode:16} {totals['ok'] / duration:>10.1f} {latency['p50']:>8.2f} "
+                      f"{latency['p99']:>8.2f} {average_batch:>10.1f} {totals['errors']:>7}")
+        print("="*70)
+
+    def close(self):
+        if self.client:
+            self.fixtures.close()
+            self.client.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Time-window Write Coalescer")
+    print("="*70)
+
+    experiments = WriteCoalescerExperiments()
+
+    try:
+        experiments.linger_benchmark()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Part D: Acknowledged-write Loss Auditor
+Writers tag every write with a dense per-writer sequence number. After a
+forced failover the collection is scanned with a streaming cursor and the
+acknowledged/seen sequences are compared with bitmap set-differences.
+"""
+
+from pymongo import MongoClient, WriteConcern
+from pymongo.read_concern import ReadConcern
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
+import os
+import sys
+import threading
+import time
+import traceback
+
+from cluster import direct_client, find_primary, find_secondaries, get_members
+
+
+class SequenceBitmap:
+    """Growable bitmap over dense sequence numbers 0..n (1 bit per write)"""
+
+    def __init__(self, size=0):
+        self.bits = bytearray((size + 7) // 8)
+
+    def add(self, seq):
+        byte = seq >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits))))
+        self.bits[byte] |= 1 << (seq & 7)
+
+    def __contains__(self, seq):
+        byte = seq >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (seq & 7)))
+
+    def as_int(self):
+        return int.from_bytes(self.bits, "little")
+
+    def __len__(self):
+        return self.as_int().bit_count()
+
+    @staticmethod
+    def members(value, limit=None):
+        """Sequence numbers set in an int produced by as_int()/set operations"""
+        found = []
+        while value and (limit is None or len(found) < limit):
+            lowest = value & -value
+            found.append(lowest.bit_length() - 1)
+            value ^= lowest
+        return found
+
+
+class AuditWriter(threading.Thread):
+    """Inserts {w, s} documents with dense s and records which were acknowledged"""
+
+    def __init__(self, writer_id, collection, stop_event):
+        super().__init__(daemon=True)
+        self.writer_id = writer_id
+        self.collection = collection
+        self.stop_event = stop_event
+        self.acked = SequenceBitmap()
+        self.uncertain = SequenceBitmap()
+        self.next_seq = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            seq = self.next_seq
+            self.next_seq += 1
+            # one application-level retry, as a typical service would do
+            for attempt in range(2):
+                try:
+                    self.collection.insert_one({"w": self.writer_id, "s": seq})
+                    self.acked.add(seq)
+                    break
+                except PyMongoError:
+                    if attempt == 1:
+                        self.uncertain.add(seq)
+                    time.sleep(0.05)
+
+
+class WriteLossAuditExperiments:
+    def __init__(self):
+        self.connection_string = os.getenv(
+            'MONGO_URI',
+            'mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0'
+        )
+        self.client = MongoClient(self.connection_string)
+        self.db = self.client['lab2_distributed_db']
+        self.test_collection = self.db['write_loss_audit']
+
+    def _force_failover(self):
+        """
+        replSetStepDown (as leader_failover does). Even with force=True the
+        primary waits up to secondaryCatchUpPeriodSecs for a caught-up
+        secondary, so acknowledged w=1 writes are normally not rolled back
+        """
+        try:
+            self.client.admin.command('replSetStepDown', 30, force=True)
+        except ConnectionFailure:
+            pass
+
+    def _set_replication_paused(self, hosts, paused):
+        """
+        stopReplProducer failpoint: secondaries stop fetching the oplog (needs
+        test commands). All or nothing: hosts already paused are resumed if a
+        later one fails
+        """
+        done = []
+        for host in hosts:
+            member = direct_client(host)
+            try:
+                member.admin.command('configureFailPoint', 'stopReplProducer',
+                                     mode='alwaysOn' if paused else 'off')
+                done.append(host)
+            except OperationFailure:
+                if paused:
+                    self._set_replication_paused(done, False)
+                return False
+            finally:
+                member.close()
+        return True
+
+    def _kill_primary(self, primary):
+        """Shut the primary down without stepping down: writes it has not replicated are rolled back"""
+        member = direct_client(primary)
+        try:
+            member.admin.command('shutdown', force=True)
+        except PyMongoError:
+            pass  # the connection drops as the member exits
+        finally:
+            member.close()
+
+    def _wait_until_settled(self, timeout=120):
+        """Wait until there is a primary, no member is in ROLLBACK and a majority write succeeds"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                states = [m['stateStr'] for m in get_members(self.client)]
+                if 'PRIMARY' in states and 'ROLLBACK' not in states and 'RECOVERING' not in states:
+                    self.db.get_collection(
+                        'write_loss_audit_marker',
+                        write_concern=WriteConcern(w="majority", wtimeout=10000)
+                    ).insert_one({"settled_at": time.time()})
+                    return True
+            except (ConnectionFailure, OperationFailure):
+                pass
+            time.sleep(1)
+        return False
+
+    def _scan(self, num_writers, batch_size):
+        """Stream {w, s} from a majority-committed view; returns (seen, duplicate) bitmaps"""
+        seen = [SequenceBitmap() for _ in range(num_writers)]
+        duplicate = [SequenceBitmap() for _ in range(num_writers)]
+        collection = self.db.get_collection('write_loss_audit', read_concern=ReadConcern("majority"))
+        scanned = 0
+        for doc in collection.find({}, {"_id": 0, "w": 1, "s": 1}, batch_size=batch_size):
+            writer, seq = doc["w"], doc["s"]
+            if seq in seen[writer]:
+                duplicate[writer].add(seq)
+            else:
+                seen[writer].add(seq)
+            scanned += 1
+        return seen, duplicate, scanned
+
+    def audit(self, write_concerns=(1, "majority"), writers=8, duration=20,
+              failover_after=10, batch_size=10000, fault='stepdown', restart=None, pause_seconds=2):
+        """
+        For each write concern: run `writers` writers for `duration` seconds,
+        inject the fault after `failover_after` seconds, wait for rollback to
+        finish and count acknowledged writes that did not survive.
+        fault='stepdown' is graceful (no w=1 loss expected); fault='kill'
+        pauses replication on the secondaries for `pause_seconds` (if test
+        commands are enabled), shuts the primary down and starts it again
+        with `restart(host)` (e.g. LocalCluster.restart_member), so it has to
+        roll back what it did not replicate.
+        """
+        print("\n" + "-"*70)
+        print("Acknowledged-write Loss Audit")
+        print("-"*70)
+        if fault == 'kill' and restart is None:
+            print("❌ fault='kill' needs a restart hook (e.g. LocalCluster.restart_member)")
+            return None
+        print(f"Writers: {writers}, duration: {duration}s, fault: {fault} at t={failover_after}s")
+
+        summary = []
+        for w_value in write_concerns:
+            print(f"\n{'─'*70}")
+            print(f"Test Configuration: w={w_value}")
+            print(f"{'─'*70}")
+
+            self._wait_until_settled()
+            self.test_collection.drop()
+            collection = self.db.get_collection(
+                'write_loss_audit',
+                write_concern=WriteConcern(w=w_value, wtimeout=5000)
+            )
+
+            stop_event = threading.Event()
+            audit_writers = [AuditWriter(k, collection, stop_event) for k in range(writers)]
+            start = time.time()
+            for writer in audit_writers:
+                writer.start()
+
+            if fault == 'kill':
+                time.sleep(max(0.0, failover_after - pause_seconds))
+                primary = find_primary(self.client)
+                secondaries = find_secondaries(self.client)
+                paused = self._set_replication_paused(secondaries, True)
+                if paused:
+                    print(f" t={time.time() - start:.1f}s: replication paused on {', '.join(secondaries)}")
+                    time.sleep(pause_seconds)
+                print(f" t={time.time() - start:.1f}s: killing primary {primary}")
+                self._kill_primary(primary)
+                if paused:
+                    self._set_replication_paused(secondaries, False)
+                restart(primary)
+            else:
+                time.sleep(failover_after)
+                primary = find_primary(self.client)
+                print(f" t={time.time() - start:.1f}s: forcing stepdown of {primary}")
+                self._force_failover()
+
+            time.sleep(max(0.0, duration - (time.time() - start)))
+            stop_event.set()
+            for writer in audit_writers:
+                writer.join()
+
+            print(f" Waiting for election and rollback to finish...")
+            if not self._wait_until_settled():
+                print(f"⚠️  Cluster did not settle, results may be incomplete")
+
+            scan_start = time.time()
+            seen, duplicate, scanned = self._scan(writers, batch_size)
+            scan_time = time.time() - scan_start
+
+            acked_total = lost_total = dup_total = uncertain_kept = 0
+            examples = []
+            for k, writer in enumerate(audit_writers):
+                acked = writer.acked.as_int()
+                present = seen[k].as_int()
+                lost = acked & ~present
+                acked_total += acked.bit_count()
+                lost_total += lost.bit_count()
+                dup_total += len(duplicate[k])
+                uncertain_kept += (writer.uncertain.as_int() & present).bit_count()
+                if lost and len(examples) < 5:
+                    examples += [(k, s) for s in SequenceBitmap.members(lost, 5 - len(examples))]
+
+            print(f"✅ Scanned {scanned} documents in {scan_time:.1f}s "
+                  f"({scanned / scan_time if scan_time else 0:.0f} docs/s)")
+            print(f"   Acknowledged writes:   {acked_total}")
+            print(f"   Lost (acked, missing): {lost_total} "
+                  f"({lost_total / acked_total * 100 if acked_total else 0:.4f}%)")
+            print(f"   Duplicated sequences:  {dup_total}")
+            print(f"   Failed but persisted:  {uncertain_kept}")
+            if examples:
+                print(f"   Example lost (writer, seq): {examples}")
+            summary.append((w_value, acked_total, lost_total, dup_total))
+
+        print(f"\n Durability Summary:")
+        for w_value, acked_total, lost_total, dup_total in summary:
+            print(f"   w={str(w_value):9} acked {acked_total:>10}  lost {lost_total:>8}  "
+                  f"duplicated {dup_total:>6}")
+        print(f"\n Notes:")
+        if fault == 'stepdown':
+            print(f"   a stepdown waits for a caught-up secondary, so 0 lost writes is expected even")
+            print(f"   for w=1; this is not evidence of safety. Use fault='kill' (menu 30, or")
+            print(f"   python write_loss_audit.py --kill) to force a rollback")
+        else:
+            print(f"   w=1 writes the primary had not replicated when it died are rolled back;")
+            print(f"   w='majority' writes must all survive")
+        print("="*70)
+        return summary
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+def audit_local_kill():
+    """
+    fault='kill' against a LocalCluster of local mongod processes, which can
+    start the killed primary again (the docker-compose members cannot be
+    restarted from the app container)
+    """
+    from local_cluster import LocalCluster
+    with LocalCluster() as cluster:
+        experiments = WriteLossAuditExperiments()
+        try:
+            return experiments.audit(fault='kill', restart=cluster.restart_member)
+        finally:
+            experiments.close()
+
+
+def main():
+    print("="*70)
+    print("Part D: Acknowledged-write Loss Auditor")
+    print("="*70)
+
+    if '--kill' in sys.argv[1:]:
+        audit_local_kill()
+        return
+
+    experiments = WriteLossAuditExperiments()
+
+    try:
+        experiments.audit()
+    except KeyboardInterrupt:
+        print("\n\nExperiment interrupted!")
+    except Exception as e:
+        print(f"\nError: {e}")
+        traceback.print_exc()
+    finally:
+        experiments.close()
+
+
+if __name__ == "__main__":
+    main()